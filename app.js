@@ -1,7 +1,8 @@
 const express = require('express');
-const { execFile } = require('child_process');
+const { PythonPool } = require('./python_pool');
 const app = express();
 const path = require('path');
+const { spawn } = require('child_process');
 const port = 3000;
 
 app.use(express.static(path.join(__dirname, 'assets')));
@@ -28,6 +29,9 @@ const tamil_nadu_districts = [
 
 const pythonPath = process.platform === 'win32' ? './venv/Scripts/python.exe' : './venv/bin/python';
 
+// Warm Python workers shared by /forecast and /api/analytics (size via PYTHON_WORKERS)
+const pythonPool = new PythonPool(pythonPath, 'forecast_worker.py', parseInt(process.env.PYTHON_WORKERS, 10) || undefined);
+
 // Home page
 app.get('/', function (req, res) {
   app_config['districts'] = tamil_nadu_districts;
@@ -44,57 +48,242 @@ app.get('/about', function (req, res) {
   res.render('about', app_config);
 });
 
+// One structured line per API request with its total latency; when the workers run with
+// WQ_TIMINGS=1 the per-stage spans from the Python side are included
+function logLatency(route, started, details, result) {
+  const entry = { event: 'request', route, total_ms: Number((Number(process.hrtime.bigint() - started) / 1e6).toFixed(3)), ...details };
+  if (result && result._timings) entry.python = result._timings;
+  console.log(JSON.stringify(entry));
+}
+
+// Single flight: identical concurrent requests share one worker call. Different scenarios for
+// the same district still reach Python, where a per-key lock lets only one of them fit.
+const inFlight = new Map();
+let coalescedRequests = 0;
+
+function coalesce(command, params) {
+  const key = JSON.stringify([command, { ...params, district: String(params.district).toLowerCase() }]);
+  if (inFlight.has(key)) {
+    coalescedRequests += 1;
+    return { promise: inFlight.get(key), coalesced: true };
+  }
+  const promise = pythonPool.request(command, params).finally(() => inFlight.delete(key));
+  inFlight.set(key, promise);
+  return { promise, coalesced: false };
+}
+
+// Send a worker result; gzip-encoded results are passed through as the compressed body
+function sendResult(res, result) {
+  if (result.encoding === 'gzip') {
+    res.set('Content-Encoding', 'gzip');
+    res.vary('Accept-Encoding');
+    res.type('application/json');
+    return res.send(Buffer.from(result.data, 'base64'));
+  }
+  res.json(result);
+}
+
 app.get('/forecast', (req, res) => {
+  const started = process.hrtime.bigint();
   const { district, start, end, precip, temp } = req.query; // precip = factor (e.g. 1.2), temp = bias (e.g. 2.0)
   if (!district || !start || !end) {
     return res.status(400).send("Missing parameters");
   }
 
   // Call Ensemble Model with Simulation Params
-  const args = ['ensemble_model.py', '--district', district, '--start', start, '--end', end];
-  if (precip) args.push('--precip_factor', precip);
-  if (temp) args.push('--temp_bias', temp);
+  const params = { district, start, end };
+  if (precip) params.precip_factor = parseFloat(precip);
+  if (temp) params.temp_bias = parseFloat(temp);
+  // Optional compact layout: format=columnar (one array per series), precision=N decimals,
+  // compress=gzip (only when the client accepts gzip)
+  if (req.query.format) params.format = req.query.format;
+  if (req.query.precision) params.precision = parseInt(req.query.precision, 10);
+  if (req.query.compress === 'gzip' && req.acceptsEncodings('gzip')) params.compress = true;
+  if ([params.precip_factor, params.temp_bias, params.precision].some((value) => value !== undefined && !Number.isFinite(value))) {
+    return res.status(400).send("Invalid parameters");
+  }
 
-  console.log('Executing Forecast:', args);
+  console.log('Executing Forecast:', params);
 
-  execFile(pythonPath, args, { maxBuffer: 1024 * 1024 * 10 }, (error, stdout, stderr) => {
-    if (error) {
-      console.error('Error executing Python script:', error);
-      console.error('stderr:', stderr);
-      return res.status(500).json({
+  const { promise, coalesced } = coalesce('forecast', params);
+  promise
+    .then((result) => {
+      logLatency('/forecast', started, { params, coalesced, status: result.error ? 400 : 200 }, result);
+      if (result.error) {
+        return res.status(400).json(result);
+      }
+      sendResult(res, result);
+    })
+    .catch((error) => {
+      logLatency('/forecast', started, { params, coalesced, status: 500 });
+      console.error('Error executing forecast:', error);
+      res.status(500).json({
         error: 'Error generating forecast',
-        details: stderr || error.message
+        details: error.message
       });
-    }
-    try {
-      const result = JSON.parse(stdout);
+    });
+});
+
+// What-if sensitivity surface for one district: every combination of the precip and temp
+// grids ("start:stop:num", e.g. 0.5:1.5:21, or a comma list) from one set of cached baselines
+app.get('/forecast/sweep', (req, res) => {
+  const started = process.hrtime.bigint();
+  const { district, start, end, precip, temp } = req.query;
+  if (!district || !start || !end || (!precip && !temp)) {
+    return res.status(400).send("Missing parameters");
+  }
+
+  const params = { district, start, end };
+  if (precip) params.precip_grid = precip;
+  if (temp) params.temp_grid = temp;
+  if (req.query.precision) params.precision = parseInt(req.query.precision, 10);
+  if (req.query.trajectories === '0') params.trajectories = false;
+  if (req.query.compress === 'gzip' && req.acceptsEncodings('gzip')) params.compress = true;
+
+  const { promise, coalesced } = coalesce('sweep', params);
+  promise
+    .then((result) => {
+      logLatency('/forecast/sweep', started, { params, coalesced, status: result.error ? 400 : 200 }, result);
       if (result.error) {
         return res.status(400).json(result);
       }
-      res.json(result);
-    } catch (parseError) {
-      console.error('Error parsing Python script output:', parseError);
+      sendResult(res, result);
+    })
+    .catch((error) => {
+      logLatency('/forecast/sweep', started, { params, coalesced, status: 500 });
+      console.error('Error executing scenario sweep:', error);
       res.status(500).json({
-        error: 'Error parsing forecast data',
-        details: parseError.message
+        error: 'Error generating scenario sweep',
+        details: error.message
       });
+    });
+});
+
+// Several districts over one date range, streamed as NDJSON: one {"district", "result"|"error"}
+// line per district as it completes (cache hits first), then a {"summary"} line.
+// districts=all or a comma-separated list.
+app.get('/forecast/batch', (req, res) => {
+  const started = process.hrtime.bigint();
+  const { districts, start, end, precip, temp } = req.query;
+  if (!districts || !start || !end) {
+    return res.status(400).send("Missing parameters");
+  }
+  const names = districts === 'all' ? tamil_nadu_districts : districts.split(',').map((d) => d.trim()).filter(Boolean);
+  if (names.length === 0) {
+    return res.status(400).send("Missing parameters");
+  }
+
+  // Checked here: the batch runs as a CLI, where a bad value would only end the process
+  if (req.query.format && !['records', 'columnar'].includes(req.query.format)) {
+    return res.status(400).json({ error: `Unknown format: ${req.query.format}` });
+  }
+  const numbers = {};
+  if (precip) numbers.precip = parseFloat(precip);
+  if (temp) numbers.temp = parseFloat(temp);
+  if (req.query.precision) numbers.precision = parseInt(req.query.precision, 10);
+  if (Object.values(numbers).some((value) => !Number.isFinite(value))) {
+    return res.status(400).send("Invalid parameters");
+  }
+
+  const args = ['ensemble_model.py', '--districts', names.join(','), '--start', start, '--end', end];
+  if (numbers.precip !== undefined) args.push('--precip_factor', String(numbers.precip));
+  if (numbers.temp !== undefined) args.push('--temp_bias', String(numbers.temp));
+  if (req.query.format) args.push('--format', req.query.format);
+  if (numbers.precision !== undefined) args.push('--precision', String(numbers.precision));
+  if (process.env.PYTHON_WORKERS) args.push('--workers', process.env.PYTHON_WORKERS);
+
+  // A dedicated process: the misses are fitted on its own process pool, so a large batch
+  // does not tie up the warm workers serving /forecast
+  const child = spawn(pythonPath, args);
+  let finished = false;
+  let stderr = '';
+  res.type('application/x-ndjson');
+  // The response is ended on exit, so a failure before any output can still answer 500
+  child.stdout.pipe(res, { end: false });
+  child.stderr.on('data', (data) => {
+    stderr = (stderr + data).slice(-2000);
+    process.stderr.write(`[batch] ${data}`);
+  });
+  child.on('error', (error) => {
+    finished = true;
+    logLatency('/forecast/batch', started, { districts: names.length, status: 500 });
+    console.error('Error executing batch forecast:', error);
+    if (!res.headersSent) {
+      res.status(500).json({ error: 'Error generating forecast', details: error.message });
+    } else {
+      res.end();
     }
   });
+  child.on('close', (code) => {
+    if (finished) return;
+    finished = true;
+    const status = code === 0 ? 200 : 500;
+    logLatency('/forecast/batch', started, { districts: names.length, status, exit_code: code });
+    if (code !== 0 && !res.headersSent) {
+      console.error('Batch forecast exited with code', code);
+      return res.status(500).json({ error: 'Error generating forecast', details: stderr.trim() || `exit code ${code}` });
+    }
+    res.end();
+  });
+  // Stop fitting if the client goes away
+  res.on('close', () => {
+    if (!finished) child.kill();
+  });
 });
 
 app.get('/api/analytics', (req, res) => {
-  execFile(pythonPath, ['get_analytics.py'], (error, stdout, stderr) => {
-    if (error) {
-      console.error('Error executing Analytics script:', error);
-      return res.status(500).json({ error: 'Failed to generate analytics' });
-    }
-    try {
-      const data = JSON.parse(stdout);
+  const started = process.hrtime.bigint();
+  pythonPool.request('analytics', {})
+    .then((data) => {
+      logLatency('/api/analytics', started, { status: 200 }, data);
       res.json(data);
-    } catch (e) {
-      res.status(500).json({ error: 'Invalid JSON from analytics script' });
-    }
-  });
+    })
+    .catch((error) => {
+      logLatency('/api/analytics', started, { status: 500 });
+      console.error('Error executing Analytics script:', error);
+      res.status(500).json({ error: 'Failed to generate analytics' });
+    });
+});
+
+// Government monitoring stations: filter by state, station (code) and year, or pass
+// group_by=state|year|state_year for per-group counts and averages
+app.get('/api/stations', (req, res) => {
+  const started = process.hrtime.bigint();
+  const { state, station, year, limit, group_by } = req.query;
+  const params = {};
+  if (state) params.state = state;
+  if (station) params.station_code = parseInt(station, 10);
+  if (year) params.year = parseInt(year, 10);
+  if (limit) params.limit = parseInt(limit, 10);
+  if (group_by) params.group_by = group_by;
+  if ([params.station_code, params.year, params.limit].some(Number.isNaN)) {
+    return res.status(400).send("Invalid parameters");
+  }
+
+  pythonPool.request('stations', params)
+    .then((result) => {
+      logLatency('/api/stations', started, { params, status: result.error ? 400 : 200 }, result);
+      if (result.error) {
+        return res.status(400).json(result);
+      }
+      res.json(result);
+    })
+    .catch((error) => {
+      logLatency('/api/stations', started, { params, status: 500 });
+      console.error('Error querying stations:', error);
+      res.status(500).json({ error: 'Failed to query stations' });
+    });
+});
+
+// Forecast cache counters; `coalesced` counts misses served by another process's fit,
+// `coalesced_requests` identical requests this server answered from one worker call
+app.get('/api/cache/stats', (req, res) => {
+  pythonPool.request('cache_stats', {})
+    .then((stats) => res.json({ ...stats, coalesced_requests: coalescedRequests, in_flight: inFlight.size }))
+    .catch((error) => {
+      console.error('Error reading cache stats:', error);
+      res.status(500).json({ error: 'Failed to read cache stats' });
+    });
 });
 
 app.listen(port, () => {
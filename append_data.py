@@ -0,0 +1,74 @@
+import os
+import time
+import argparse
+import pandas as pd
+from data_store import DATASET_FILE, MEASURE_COLUMNS, COLUMNAR_DIR, get_district
+from columnar_store import read_meta, ingest_district_dataset
+from ensemble_model import forecast_fingerprint, fit_members, build_cache_entry, store_cache_entry
+from cache_store import list_keys
+from get_analytics import compute_analytics
+
+# Append new monthly observations to the district dataset and refresh the affected districts.
+# Fitted models are updated with only the new rows (see ensemble_model.incremental_update),
+# so a refresh costs a fraction of a cold fit.
+
+COLUMNS = ['Date', 'District'] + MEASURE_COLUMNS
+
+def append_rows(rows_path, dataset_path=DATASET_FILE):
+    new_rows = pd.read_csv(rows_path)
+    missing = [column for column in COLUMNS if column not in new_rows.columns]
+    if missing:
+        raise ValueError(f"Missing columns in {rows_path}: {', '.join(missing)}")
+
+    # Match the dataset's existing line endings
+    with open(dataset_path, 'rb') as f:
+        line_end = '\r\n' if b'\r\n' in f.readline() else '\n'
+        f.seek(-1, 2)
+        tail = f.read(1)
+    with open(dataset_path, 'a', newline='') as f:
+        if tail != b'\n':
+            f.write(line_end)
+        new_rows[COLUMNS].to_csv(f, header=False, index=False, lineterminator=line_end)
+    return sorted(new_rows['District'].unique())
+
+def refresh_district(district):
+    # Rebuild every cached forecast of the district from its (incrementally updated) models
+    df = get_district(district)
+    if df is None:
+        raise ValueError(f"District not found: {district}")
+    fingerprint = forecast_fingerprint(df)
+    keys = list_keys(f"{district.lower()}_")
+    for key in keys:
+        periods = int(key.rsplit('_', 1)[1])
+        forecasts = fit_members(district, df, periods, fingerprint)
+        store_cache_entry(key, build_cache_entry(df, periods, forecasts, fingerprint))
+    return keys
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", nargs="?", help="CSV with Date,District,Precipitation_mm,Temperature_C,Chlorophyll_ug_L rows to append")
+    parser.add_argument("--districts", help="Comma-separated districts to refresh without appending rows")
+    args = parser.parse_args()
+
+    if args.rows:
+        districts = append_rows(args.rows)
+        print(f"Appended rows for {len(districts)} district(s)")
+        # Keep an existing columnar copy of this CSV in step with it
+        meta = read_meta(COLUMNAR_DIR)
+        if meta is not None and meta["source"]["path"] == os.path.abspath(DATASET_FILE):
+            ingest_district_dataset(DATASET_FILE, COLUMNAR_DIR)
+            print(f"Re-ingested columnar copy in {COLUMNAR_DIR}")
+    elif args.districts:
+        districts = args.districts.split(',')
+    else:
+        parser.error("pass a CSV of new rows or --districts")
+
+    t_start = time.time()
+    for district in districts:
+        t0 = time.time()
+        keys = refresh_district(district)
+        print(f"Refreshed {district} ({len(keys)} cached forecasts) in {time.time() - t0:.2f}s")
+    t0 = time.time()
+    compute_analytics()
+    print(f"Updated analytics snapshot in {time.time() - t0:.2f}s")
+    print(f"Refresh finished in {time.time() - t_start:.2f}s")
@@ -0,0 +1,153 @@
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from data_store import load_dataset, MEASURE_COLUMNS
+from ensemble_model import MODEL_CONFIG, future_dates, predict_arima, simulate_paths, path_bounds
+
+# Batched forecasting engine: every district shares the same monthly grid, so the series
+# are stacked into one (districts x months) matrix and the ARIMA and MLP members are
+# forecast for all districts in one pass. Output per district matches
+# ensemble_model.forecast_arima/forecast_lstm (same ds/yhat/yhat_lower/yhat_upper layout,
+# same values up to floating-point rounding).
+#
+# ARIMA keeps one statsmodels fit per series. The MLP keeps one network per district, fitted
+# on stride-tricks lag windows of the stacked matrix; the recursive forecast and its
+# residual-bootstrap paths then advance every district together, one stacked forward pass
+# per month instead of one predict call per district and month.
+
+def stack_series(column, districts=None):
+    # Returns {last_date: (names, matrix)}; districts are grouped by grid so unequal
+    # histories are batched separately instead of padded
+    df = load_dataset()
+    df = df[['Date', 'District', column]].sort_values(['District', 'Date'], kind='stable')
+    if districts is not None:
+        wanted = {d.lower() for d in districts}
+        df = df[df['District'].astype(str).str.lower().isin(wanted)]
+
+    groups = {}
+    for district, group in df.groupby('District', observed=True, sort=True):
+        key = (len(group), group['Date'].iloc[-1])
+        names, rows = groups.setdefault(key, ([], []))
+        names.append(str(district))
+        rows.append(group[column].to_numpy(dtype='float64'))
+    return {
+        last_date: (names, np.vstack(rows))
+        for (_, last_date), (names, rows) in groups.items()
+    }
+
+def lag_windows(matrix, look_back):
+    # (series, time) -> inputs (series, windows, look_back) and targets (series, windows), no copies
+    windows = sliding_window_view(matrix, look_back + 1, axis=1)
+    return windows[..., :-1], windows[..., -1]
+
+def to_frames(names, last_date, forecast, lower, upper):
+    ds = future_dates(last_date, forecast.shape[1])
+    return {
+        name: pd.DataFrame({
+            'ds': ds,
+            'yhat': forecast[i],
+            'yhat_lower': lower[i],
+            'yhat_upper': upper[i]
+        })
+        for i, name in enumerate(names)
+    }
+
+# --- ARIMA(1,1,1) ---
+def batch_forecast_arima(column, periods, districts=None):
+    # One statsmodels fit per district, as fit_arima; forecasts and intervals from predict_arima
+    from statsmodels.tsa.arima.model import ARIMA
+    results = {}
+    for last_date, (names, matrix) in stack_series(column, districts).items():
+        for name, series in zip(names, matrix):
+            model = ARIMA(series, order=tuple(MODEL_CONFIG['arima']['order']))
+            state = {"kind": "arima", "model": model.fit(), "last_date": last_date}
+            results[name] = predict_arima(state, periods)
+    return results
+
+# --- MLP (LSTM proxy) ---
+class StackedMLP:
+    # The districts' fitted MLPRegressors evaluated together: rows of predict's input are
+    # grouped by district (series * rows, look_back), each group going through its own
+    # network's weights. Same forward pass as MLPRegressor.predict (ReLU hidden layers,
+    # identity output).
+    def __init__(self, models):
+        self.coefs = [np.stack(layer) for layer in zip(*(model.coefs_ for model in models))]
+        self.intercepts = [np.stack(layer)[:, None, :] for layer in zip(*(model.intercepts_ for model in models))]
+
+    def predict(self, X):
+        activation = X.reshape(len(self.coefs[0]), -1, X.shape[1])
+        for i, (coef, intercept) in enumerate(zip(self.coefs, self.intercepts)):
+            activation = np.matmul(activation, coef) + intercept
+            if i < len(self.coefs) - 1:
+                np.maximum(activation, 0, out=activation)
+        return activation.reshape(-1)
+
+def fit_lstm_batch(matrix):
+    # One network per district, fitted exactly as fit_lstm does: per-district min-max scaling,
+    # look_back lag windows, MODEL_CONFIG['lstm'] settings
+    from sklearn.preprocessing import MinMaxScaler
+    from sklearn.neural_network import MLPRegressor
+    config = MODEL_CONFIG['lstm']
+    look_back = config['look_back']
+    scalers = [MinMaxScaler(feature_range=(0, 1)).fit(series.reshape(-1, 1)) for series in matrix]
+    scaled = np.vstack([scaler.transform(series.reshape(-1, 1)).flatten() for scaler, series in zip(scalers, matrix)])
+
+    X, y = lag_windows(scaled, look_back)
+    models, residuals = [], []
+    for inputs, targets in zip(X, y):
+        model = MLPRegressor(hidden_layer_sizes=tuple(config['hidden_layer_sizes']), max_iter=config['max_iter'], random_state=config['random_state'])
+        model.fit(inputs, targets)
+        models.append(model)
+        # In-sample one-step errors (scaled), resampled for the prediction intervals
+        residuals.append(targets - model.predict(inputs))
+    return {
+        "models": models,
+        "min": np.array([scaler.min_[0] for scaler in scalers])[:, None],
+        "scale": np.array([scaler.scale_[0] for scaler in scalers])[:, None],
+        "window": scaled[:, -look_back:],
+        "residuals": np.vstack(residuals)
+    }
+
+def predict_lstm_batch(fit, periods):
+    # (forecast, lower, upper): every district's forecast and residual-bootstrap paths advance
+    # together, one stacked forward pass per step
+    config = MODEL_CONFIG['lstm']
+    forecast, paths = simulate_paths(StackedMLP(fit["models"]), fit["window"], fit["residuals"], periods,
+                                     config['interval_paths'], config['random_state'])
+    lower, upper = path_bounds(paths)
+    # MinMaxScaler.inverse_transform, for every district at once
+    return tuple((values - fit["min"]) / fit["scale"] for values in (forecast, lower, upper))
+
+def batch_forecast_lstm(column, periods, districts=None):
+    look_back = MODEL_CONFIG['lstm']['look_back']
+    results = {}
+    for last_date, (names, matrix) in stack_series(column, districts).items():
+        if matrix.shape[1] <= look_back:
+            # Fallback if not enough data
+            results.update(batch_forecast_arima(column, periods, names))
+            continue
+        results.update(to_frames(names, last_date, *predict_lstm_batch(fit_lstm_batch(matrix), periods)))
+    return results
+
+BATCH_MEMBERS = {
+    'arima': batch_forecast_arima,
+    'lstm': batch_forecast_lstm
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--column", choices=MEASURE_COLUMNS, default='Chlorophyll_ug_L')
+    parser.add_argument("--model", choices=sorted(BATCH_MEMBERS), default='arima')
+    parser.add_argument("--periods", type=int, default=6)
+    parser.add_argument("--districts", help="Comma-separated district names (default: all)")
+    args = parser.parse_args()
+
+    districts = args.districts.split(',') if args.districts else None
+    forecasts = BATCH_MEMBERS[args.model](args.column, args.periods, districts)
+    output = {}
+    for district, frame in forecasts.items():
+        frame['ds'] = frame['ds'].dt.strftime('%Y-%m-%d')
+        output[district] = frame.to_dict(orient='records')
+    print(json.dumps(output))
@@ -0,0 +1,321 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import contextlib
+
+# Benchmark harness for the forecasting and analytics hot paths.
+# Every case runs in a fresh interpreter so import cost, wall time and peak RSS are isolated;
+# each case also reports a per-stage breakdown. Results are written as JSON so two commits
+# can be compared with --compare.
+#
+#   python benchmark.py                               # all cases on the bundled dataset
+#   python benchmark.py --scale 1x1,4x1,1x3           # districts x history scaled datasets
+#   python benchmark.py --output new.json --compare old.json
+
+SOURCE_DATASET = "./dataset/tamil_nadu_water_quality_dataset.csv"
+MEASURES = ['Precipitation_mm', 'Temperature_C', 'Chlorophyll_ug_L']
+
+# --- Synthetic datasets ---
+def synthetic_dataset(districts_factor, history_factor, out_path, source=SOURCE_DATASET):
+    # More districts: noisy copies of every district under a new name.
+    # Longer histories: the observed period is repeated further back in time.
+    # numpy/pandas are imported here so the child interpreters running the cases start
+    # without them (case_import measures their import cost)
+    import numpy as np
+    import pandas as pd
+    df = pd.read_csv(source)
+    months = pd.PeriodIndex(df['Date'], freq='M')
+    span = months.max().ordinal - months.min().ordinal + 1
+    rng = np.random.default_rng(0)
+
+    history = []
+    for k in range(history_factor):
+        block = df.copy()
+        block['Date'] = (months - (history_factor - 1 - k) * span).strftime('%Y-%m')
+        history.append(block)
+    history = pd.concat(history, ignore_index=True)
+
+    replicas = []
+    for r in range(districts_factor):
+        block = history.copy()
+        if r:
+            block['District'] = block['District'] + f" {r + 1}"
+            block[MEASURES] = block[MEASURES] * rng.normal(1.0, 0.05, size=(len(block), len(MEASURES)))
+        replicas.append(block)
+    out = pd.concat(replicas, ignore_index=True).sort_values(['Date', 'District'], kind='stable')
+    out[MEASURES] = out[MEASURES].round(2)
+    out.to_csv(out_path, index=False)
+    return out_path
+
+# --- Cases (run inside the child interpreter) ---
+def timed(stages, name, fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    stages[name] = stages.get(name, 0.0) + time.perf_counter() - t0
+    return result
+
+def sample_districts(count):
+    from data_store import list_districts
+    return list_districts()[:count]
+
+def case_import(opts, stages):
+    # This module imports only the standard library, so nothing the timed imports need is loaded yet
+    import importlib
+    timed(stages, 'import_ensemble_model', importlib.import_module, 'ensemble_model')
+    timed(stages, 'import_get_analytics', importlib.import_module, 'get_analytics')
+
+# Cold-process startup per serving mode: each snippet runs in a fresh interpreter under
+# `python -X importtime`, after the cache and analytics snapshot have been seeded
+STARTUP_MODES = {
+    'hit': "import ensemble_model as em; em.forecast_ensemble({district!r}, {start!r}, {end!r})",
+    'sweep': "import ensemble_model as em; em.forecast_sweep({district!r}, {start!r}, {end!r}, [0.8, 1.0, 1.2], [0.0, 1.0])",
+    'analytics': "import get_analytics as ga; ga.compute_analytics()",
+    'worker': "import forecast_worker"
+}
+# Packages listed individually in the import report when they take at least this long
+IMPORT_REPORT_MIN_S = 0.02
+
+def import_times(stderr):
+    # Self time per top-level package from `-X importtime` output, in seconds
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0.0) + int(self_us) / 1e6
+    return totals
+
+def case_startup(opts, stages):
+    district = sample_districts(1)[0]
+    here = os.path.dirname(os.path.abspath(__file__))
+    # Seed in separate processes so this one stays free of the model libraries
+    seed = [sys.executable, os.path.join(here, "ensemble_model.py"), "--district", district, "--start", opts['start'], "--end", opts['end']]
+    timed(stages, 'seed_cache', subprocess.run, seed, capture_output=True, check=True)
+    timed(stages, 'seed_analytics', subprocess.run, [sys.executable, os.path.join(here, "get_analytics.py")], capture_output=True, check=True)
+    for mode, code in STARTUP_MODES.items():
+        code = code.format(district=district, start=opts['start'], end=opts['end'])
+        proc = timed(stages, f"{mode}_process", subprocess.run, [sys.executable, "-X", "importtime", "-c", code],
+                     cwd=here, capture_output=True, text=True, check=True)
+        packages = import_times(proc.stderr)
+        stages[f"{mode}_imports"] = sum(packages.values())
+        for package, seconds in sorted(packages.items(), key=lambda item: -item[1]):
+            if seconds >= IMPORT_REPORT_MIN_S:
+                stages[f"{mode}_import:{package}"] = seconds
+
+def case_load(opts, stages):
+    import data_store
+    # Single-district read before anything else is loaded (columnar fast path when present)
+    timed(stages, 'read_rows', data_store.read_rows, 'salem')
+    timed(stages, 'load_dataset', data_store.load_dataset)
+    for district in data_store.list_districts():
+        timed(stages, 'district_lookup', data_store.get_district, district)
+
+def case_members(opts, stages):
+    import ensemble_model as em
+    from data_store import get_district
+    members = {'prophet': em.forecast_prophet, 'arima': em.forecast_arima, 'lstm': em.forecast_lstm}
+    for district in sample_districts(opts['districts']):
+        df = get_district(district)
+        for param in em.PARAMETERS:
+            for name, forecast in members.items():
+                timed(stages, name, forecast, df, param, opts['periods'])
+
+def instrument_ensemble(em, stages):
+    # Wrap the pipeline steps forecast_ensemble looks up at call time
+    def wrap(name, fn):
+        return lambda *args, **kwargs: timed(stages, name, fn, *args, **kwargs)
+    for name in ['load_data', 'build_cache_entry', 'store_cache_entry', 'render_forecast']:
+        setattr(em, name, wrap(name, getattr(em, name)))
+    em.MEMBERS = {
+        member: tuple(wrap(f"{member}_{step}", fn) for step, fn in zip(['fit', 'predict', 'update'], fns))
+        for member, fns in em.MEMBERS.items()
+    }
+
+def case_forecast_cold(opts, stages):
+    import ensemble_model as em
+    instrument_ensemble(em, stages)
+    for district in sample_districts(opts['districts']):
+        timed(stages, 'forecast_ensemble', em.forecast_ensemble, district, opts['start'], opts['end'], refit=True)
+
+def case_forecast_hit(opts, stages):
+    import ensemble_model as em
+    districts = sample_districts(opts['districts'])
+    for district in districts:
+        timed(stages, 'seed_cache', em.forecast_ensemble, district, opts['start'], opts['end'])
+    instrument_ensemble(em, stages)
+    for _ in range(opts['repeat']):
+        for district in districts:
+            timed(stages, 'forecast_ensemble', em.forecast_ensemble, district, opts['start'], opts['end'], 1.2, 1.0)
+
+def case_analytics(opts, stages):
+    from get_analytics import compute_analytics
+    for _ in range(opts['repeat']):
+        timed(stages, 'rebuild_snapshot', compute_analytics, True)
+    for _ in range(opts['repeat']):
+        timed(stages, 'serve_snapshot', compute_analytics)
+
+def case_batch(opts, stages):
+    import batch_forecast
+    for param in MEASURES:
+        for name, forecast in batch_forecast.BATCH_MEMBERS.items():
+            timed(stages, f"batch_{name}", forecast, param, opts['periods'])
+
+def case_precompute(opts, stages):
+    import precompute_cache
+    precompute_cache.tamil_nadu_districts = sample_districts(opts['precompute_districts'])
+    with contextlib.redirect_stdout(sys.stderr):
+        timed(stages, 'precompute', precompute_cache.precompute, opts['workers'], True)
+
+CASES = {
+    'import': case_import,
+    'startup': case_startup,
+    'load': case_load,
+    'members': case_members,
+    'forecast_cold': case_forecast_cold,
+    'forecast_hit': case_forecast_hit,
+    'analytics': case_analytics,
+    'batch': case_batch,
+    'precompute': case_precompute
+}
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_case_in_child(name, opts):
+    stages = {}
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        CASES[name](opts, stages)
+    wall = time.perf_counter() - t0
+    print(json.dumps({
+        "wall_s": round(wall, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "stages": {stage: round(seconds, 4) for stage, seconds in stages.items()}
+    }))
+
+# --- Orchestration ---
+def run_case(name, opts, dataset, workdir, columnar_root):
+    env = dict(os.environ)
+    env["WATER_QUALITY_DATASET"] = dataset
+    env["WATER_QUALITY_COLUMNAR"] = columnar_root
+    # Fresh, unseeded cache per case so cold/hit numbers do not depend on earlier runs
+    env["FORECAST_CACHE_DB"] = os.path.join(workdir, f"cache_{name}_{time.time_ns()}.sqlite")
+    env["FORECAST_CACHE_SEED"] = ""
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", name, "--options", json.dumps(opts)],
+        env=env, capture_output=True, text=True
+    )
+    process_wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_wall_s"] = round(process_wall, 4)
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["case"], r["dataset"]): r for r in json.load(f)["results"]}
+    print(f"\nComparison against {baseline_path}:")
+    for result in results:
+        old = baseline.get((result["case"], result["dataset"]))
+        if not old or "wall_s" not in old or "wall_s" not in result:
+            continue
+        change = (result["wall_s"] - old["wall_s"]) / old["wall_s"] * 100 if old["wall_s"] else 0.0
+        print(f"  {result['case']:<14} {result['dataset']:<8} {old['wall_s']:>9.3f}s -> {result['wall_s']:>9.3f}s ({change:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", default=",".join(CASES), help="Comma-separated subset of: " + ", ".join(CASES))
+    parser.add_argument("--scale", default="1x1", help="Comma-separated DISTRICTSxHISTORY factors, e.g. 1x1,4x1,1x3")
+    parser.add_argument("--districts", type=int, default=3, help="Districts sampled by per-district cases")
+    parser.add_argument("--precompute-districts", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Process pool size for the precompute case")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions for cache-hit and analytics cases")
+    parser.add_argument("--start", default="2025-12")
+    parser.add_argument("--end", default="2026-06")
+    parser.add_argument("--periods", type=int, default=14)
+    parser.add_argument("--columnar", action="store_true", help="Read datasets through a columnar copy instead of the CSV")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier results file to compare wall times against")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--options", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_case_in_child(args.child, json.loads(args.options))
+        return
+
+    opts = {
+        "districts": args.districts,
+        "precompute_districts": args.precompute_districts,
+        "workers": args.workers,
+        "repeat": args.repeat,
+        "start": args.start,
+        "end": args.end,
+        "periods": args.periods
+    }
+    cases = [name for name in args.cases.split(',') if name]
+    unknown = [name for name in cases if name not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.scale.split(','):
+            districts_factor, history_factor = (int(x) for x in scale.lower().split('x'))
+            if (districts_factor, history_factor) == (1, 1):
+                dataset = os.path.abspath(SOURCE_DATASET)
+            else:
+                dataset = synthetic_dataset(districts_factor, history_factor, os.path.join(workdir, f"dataset_{scale}.csv"))
+            rows = sum(1 for _ in open(dataset)) - 1
+            columnar_root = os.path.join(workdir, f"columnar_{scale}")
+            if args.columnar:
+                from columnar_store import ingest_district_dataset
+                ingest_district_dataset(dataset, os.path.join(columnar_root, "tamil_nadu_water_quality"))
+            print(f"Dataset {scale} ({rows} rows{', columnar' if args.columnar else ''})")
+            for name in cases:
+                result = dict(case=name, dataset=scale, rows=rows, columnar=args.columnar,
+                              **run_case(name, opts, dataset, workdir, columnar_root))
+                results.append(result)
+                if "error" in result:
+                    print(f"  {name:<14} FAILED: {result['error']}")
+                    continue
+                stages = ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in result["stages"].items())
+                print(f"  {name:<14} {result['wall_s']:>9.3f}s  peak {result['peak_rss_mb']:>7.1f} MB  [{stages}]")
+
+    output = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "options": opts
+        },
+        "results": results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
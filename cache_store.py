@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+from contextlib import contextmanager
+
+CACHE_DB = os.environ.get("FORECAST_CACHE_DB", "./dataset/forecast_cache.sqlite")
+# Pre-generated cache shipped with the repo; imported into the database on first use
+# (set FORECAST_CACHE_SEED to an empty string to start from an empty cache)
+LEGACY_CACHE_FILE = os.environ.get("FORECAST_CACHE_SEED", "./dataset/forecast_cache.json")
+
+# Eviction policy: keep at most CACHE_MAX_ENTRIES (least recently used go first) and drop
+# entries nobody has read for CACHE_TTL_DAYS
+CACHE_MAX_ENTRIES = int(os.environ.get("FORECAST_CACHE_MAX_ENTRIES", 500))
+CACHE_TTL_DAYS = float(os.environ.get("FORECAST_CACHE_TTL_DAYS", 30))
+# A background refresh that has not finished after this long may be claimed again
+REFRESH_CLAIM_SECONDS = 600
+# At most this many background refreshes run at once across all processes; stale entries
+# beyond it keep being served and are claimed by a later request once a slot frees up
+MAX_REFRESHES = int(os.environ.get("FORECAST_MAX_REFRESHES", max(1, (os.cpu_count() or 1) // 2)))
+# single_flight: a waiter gives up after FORECAST_LOCK_TIMEOUT seconds and computes the entry
+# itself; a claim older than that (its holder died or hung) may be taken over
+LOCK_TIMEOUT_S = float(os.environ.get("FORECAST_LOCK_TIMEOUT", "180"))
+
+_connections = {}
+
+@contextmanager
+def _transaction(conn):
+    # Connections run in autocommit mode; group multi-statement updates explicitly
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+def _import_legacy(conn):
+    if conn.execute("SELECT value FROM meta WHERE name = 'legacy_imported'").fetchone():
+        return
+    entries = {}
+    if LEGACY_CACHE_FILE and os.path.exists(LEGACY_CACHE_FILE):
+        try:
+            with open(LEGACY_CACHE_FILE, 'r') as f:
+                entries = json.load(f)
+        except ValueError:
+            entries = {}
+    now = time.time()
+    with _transaction(conn):
+        for key, entry in entries.items():
+            value = json.dumps(entry, separators=(',', ':'))
+            conn.execute(
+                "INSERT OR IGNORE INTO forecasts (key, value, size, updated_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now)
+            )
+        conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('legacy_imported', ?)", (str(now),))
+
+def _add_missing_columns(conn):
+    # Databases created before LRU tracking and background refresh lack these columns
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(forecasts)")}
+    if 'accessed_at' not in columns:
+        conn.execute("ALTER TABLE forecasts ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+        conn.execute("UPDATE forecasts SET accessed_at = updated_at")
+    if 'refreshing_at' not in columns:
+        conn.execute("ALTER TABLE forecasts ADD COLUMN refreshing_at REAL")
+
+def _connect(path=None):
+    path = path or CACHE_DB
+    # One connection per process; forked workers must not share the parent's handle
+    conn_key = (path, os.getpid())
+    conn = _connections.get(conn_key)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS forecasts ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, updated_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL DEFAULT 0, refreshing_at REAL)"
+        )
+        _add_missing_columns(conn)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS models ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, state BLOB NOT NULL, trajectory TEXT NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            "name TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS inflight (key TEXT PRIMARY KEY, token TEXT NOT NULL, claimed_at REAL NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        _import_legacy(conn)
+        _connections[conn_key] = conn
+    return conn
+
+def _bump(conn, name, amount=1):
+    conn.execute(
+        "INSERT INTO counters (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, amount)
+    )
+
+def get_entry(key, path=None, track=True):
+    # track=False reads without touching hit/miss counters or LRU order (maintenance jobs)
+    conn = _connect(path)
+    row = conn.execute("SELECT value FROM forecasts WHERE key = ?", (key,)).fetchone()
+    if not track:
+        return json.loads(row[0]) if row else None
+    _bump(conn, 'hits' if row else 'misses')
+    if row is None:
+        return None
+    conn.execute("UPDATE forecasts SET accessed_at = ? WHERE key = ?", (time.time(), key))
+    return json.loads(row[0])
+
+def get_entries(keys, path=None):
+    # Bulk lookup for batch requests: {key: entry} for the keys that are cached, one query,
+    # counted as hits/misses like individual reads
+    conn = _connect(path)
+    keys = list(dict.fromkeys(keys))
+    found = {}
+    # Stay well below SQLite's bound-parameter limit
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        for key, value in conn.execute(f"SELECT key, value FROM forecasts WHERE key IN ({marks})", chunk):
+            found[key] = json.loads(value)
+    if found:
+        now = time.time()
+        conn.executemany("UPDATE forecasts SET accessed_at = ? WHERE key = ?", [(now, key) for key in found])
+        _bump(conn, 'hits', len(found))
+    if len(keys) > len(found):
+        _bump(conn, 'misses', len(keys) - len(found))
+    return found
+
+def put_entry(key, entry, path=None):
+    conn = _connect(path)
+    value = json.dumps(entry, separators=(',', ':'))
+    now = time.time()
+    # Single-statement upsert: readers see either the old or the new entry, never a partial one.
+    # Replacing the row also clears any pending refresh claim.
+    conn.execute(
+        "INSERT OR REPLACE INTO forecasts (key, value, size, updated_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+        (key, value, len(value), now, now)
+    )
+    evict(path)
+
+def claim_refresh(key, path=None):
+    # Returns True for exactly one caller per stale entry until the refresh lands or times out,
+    # and only while fewer than MAX_REFRESHES claims are live (one statement, so the check
+    # and the claim are atomic across processes)
+    now = time.time()
+    cursor = _connect(path).execute(
+        "UPDATE forecasts SET refreshing_at = ? WHERE key = ? AND (refreshing_at IS NULL OR refreshing_at < ?) "
+        "AND (SELECT COUNT(*) FROM forecasts WHERE refreshing_at >= ?) < ?",
+        (now, key, now - REFRESH_CLAIM_SECONDS, now - REFRESH_CLAIM_SECONDS, MAX_REFRESHES)
+    )
+    return cursor.rowcount == 1
+
+def release_refresh(key, path=None):
+    # Give up a claim whose refresh ended without storing a new entry (a stored entry clears it)
+    _connect(path).execute("UPDATE forecasts SET refreshing_at = NULL WHERE key = ?", (key,))
+
+def refreshes_running(path=None):
+    cutoff = time.time() - REFRESH_CLAIM_SECONDS
+    return _connect(path).execute("SELECT COUNT(*) FROM forecasts WHERE refreshing_at >= ?", (cutoff,)).fetchone()[0]
+
+def _claim_inflight(conn, key, token):
+    # One row per key being computed; a claim older than LOCK_TIMEOUT_S is taken over
+    now = time.time()
+    cursor = conn.execute(
+        "INSERT INTO inflight (key, token, claimed_at) VALUES (?, ?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET token = excluded.token, claimed_at = excluded.claimed_at "
+        "WHERE inflight.claimed_at < ?",
+        (key, token, now, now - LOCK_TIMEOUT_S)
+    )
+    return cursor.rowcount == 1
+
+@contextmanager
+def single_flight(key, path=None, timeout=None):
+    # Exclusive per-key claim across processes (a row in the inflight table, removed again on
+    # exit, so only keys being computed right now take up space) held while a cache miss is
+    # computed. Only callers for the same key wait for each other. Yields True when the caller
+    # had to wait for another holder, i.e. the entry was probably just computed and should be
+    # read again. After `timeout` seconds of waiting the caller proceeds without the claim
+    # (also yielding True).
+    timeout = LOCK_TIMEOUT_S if timeout is None else timeout
+    conn = _connect(path)
+    token = f"{os.getpid()}:{time.monotonic_ns()}"
+    waited, claimed = False, False
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while True:
+        if _claim_inflight(conn, key, token):
+            claimed = True
+            break
+        waited = True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 1.0)
+    try:
+        yield waited
+    finally:
+        if claimed:
+            # A holder whose claim was taken over after LOCK_TIMEOUT_S leaves the new one alone
+            conn.execute("DELETE FROM inflight WHERE key = ? AND token = ?", (key, token))
+
+def record_coalesced(path=None):
+    # A miss served by another process's computation instead of its own; callers count it only
+    # when the entry read after waiting is current
+    _bump(_connect(path), 'coalesced')
+
+def evict(path=None):
+    conn = _connect(path)
+    with _transaction(conn):
+        expired = conn.execute(
+            "DELETE FROM forecasts WHERE accessed_at < ?", (time.time() - CACHE_TTL_DAYS * 86400,)
+        ).rowcount
+        overflow = conn.execute(
+            "DELETE FROM forecasts WHERE key IN ("
+            "SELECT key FROM forecasts ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (CACHE_MAX_ENTRIES,)
+        ).rowcount
+        if expired + overflow:
+            _bump(conn, 'evictions', expired + overflow)
+
+# --- Fitted model state ---
+# One row per (district, parameter, member): the serialized fitted model plus the longest
+# forecast trajectory predicted from it so far.
+
+def get_model_state(key, path=None):
+    row = _connect(path).execute(
+        "SELECT fingerprint, state, trajectory FROM models WHERE key = ?", (key,)
+    ).fetchone()
+    if row is None:
+        return None
+    return {"fingerprint": row[0], "state": row[1], "trajectory": json.loads(row[2])}
+
+def put_model_state(key, fingerprint, state, trajectory, path=None):
+    _connect(path).execute(
+        "INSERT OR REPLACE INTO models (key, fingerprint, state, trajectory, updated_at) VALUES (?, ?, ?, ?, ?)",
+        (key, fingerprint, state, json.dumps(trajectory, separators=(',', ':')), time.time())
+    )
+
+def put_trajectory(key, fingerprint, trajectory, path=None):
+    # Extend the stored trajectory without rewriting the model blob
+    _connect(path).execute(
+        "UPDATE models SET trajectory = ?, updated_at = ? WHERE key = ? AND fingerprint = ?",
+        (json.dumps(trajectory, separators=(',', ':')), time.time(), key, fingerprint)
+    )
+
+# --- Derived snapshots ---
+# Whole-dataset artifacts (e.g. the analytics payload) tied to the dataset fingerprint they
+# were computed from. Not subject to forecast eviction.
+
+def get_snapshot(name, path=None):
+    row = _connect(path).execute("SELECT fingerprint, value FROM snapshots WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return None
+    return {"fingerprint": row[0], "value": json.loads(row[1])}
+
+def put_snapshot(name, fingerprint, value, path=None):
+    _connect(path).execute(
+        "INSERT OR REPLACE INTO snapshots (name, fingerprint, value, updated_at) VALUES (?, ?, ?, ?)",
+        (name, fingerprint, json.dumps(value, separators=(',', ':')), time.time())
+    )
+
+def list_keys(prefix, path=None):
+    rows = _connect(path).execute(
+        "SELECT key FROM forecasts WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+def delete_entry(key, path=None):
+    _connect(path).execute("DELETE FROM forecasts WHERE key = ?", (key,))
+
+def cache_stats(path=None):
+    conn = _connect(path)
+    entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM forecasts").fetchone()
+    models, model_bytes = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(LENGTH(state) + LENGTH(trajectory)), 0) FROM models"
+    ).fetchone()
+    counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+    return {
+        "entries": entries,
+        "bytes": size,
+        "hits": counters.get('hits', 0),
+        "misses": counters.get('misses', 0),
+        "evictions": counters.get('evictions', 0),
+        "coalesced": counters.get('coalesced', 0),
+        "refreshes_running": refreshes_running(path),
+        "max_refreshes": MAX_REFRESHES,
+        "fitted_models": models,
+        "fitted_model_bytes": model_bytes,
+        "max_entries": CACHE_MAX_ENTRIES
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stats", action="store_true", help="Print entry count, size and hit/miss counters")
+    parser.add_argument("--delete", metavar="KEY", help="Remove a single cache entry")
+    args = parser.parse_args()
+
+    if args.delete:
+        delete_entry(args.delete)
+    print(json.dumps(cache_stats()))
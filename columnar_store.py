@@ -0,0 +1,231 @@
+import os
+import re
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+# Columnar binary copies of the CSV datasets: one .npy file per column plus meta.json.
+#   - string columns are stored as integer codes with their categories in meta.json
+#   - dates are datetime64, measures float32 when that round-trips losslessly (else float64)
+#   - rows are sorted by a partition column (district/state) then date, and meta.json holds each
+#     partition's row range, so a reader memory-maps the files and touches only the rows it asks for
+#   - row_order.npy maps stored rows back to their CSV row (to restore file order)
+# The copy remembers the size and mtime of the CSV it came from; once the CSV changes it is
+# ignored (readers fall back to the CSV) until `python columnar_store.py` is run again.
+
+FORMAT_VERSION = 1
+COLUMNAR_ROOT = os.environ.get("WATER_QUALITY_COLUMNAR", "./dataset/columnar")
+
+DISTRICT_CSV = "./dataset/tamil_nadu_water_quality_dataset.csv"
+GOVERNMENT_CSV = "./dataset/government_water_data_public.csv"
+
+# Normalized names for the government CSV headers (after lowercasing and collapsing
+# punctuation; the conductivity unit's micro sign is mis-encoded in the source file)
+GOVERNMENT_COLUMNS = {
+    "station_code": "station_code",
+    "locations": "location",
+    "state": "state",
+    "temp": "temperature_c",
+    "chlorophyll": "chlorophyll",
+    "precipitation": "precipitation",
+    "conductivity_mhos_cm": "conductivity_umhos_cm",
+    "b_o_d_mg_l": "bod_mg_l",
+    "nitratenan_n_nitritenann_mg_l": "nitrate_nitrite_mg_l",
+    "fecal_coliform_mpn_100ml": "fecal_coliform_mpn_100ml",
+    "total_coliform_mpn_100ml_mean": "total_coliform_mpn_100ml",
+    "year": "year"
+}
+
+def columnar_dir(name, root=COLUMNAR_ROOT):
+    return os.path.join(root, name)
+
+def normalize_column(name):
+    return re.sub(r'[^0-9a-z]+', '_', name.lower()).strip('_')
+
+def read_csv_text(path, **kwargs):
+    # Some public CSVs are not valid UTF-8
+    try:
+        return pd.read_csv(path, **kwargs)
+    except UnicodeDecodeError:
+        return pd.read_csv(path, encoding='latin-1', **kwargs)
+
+def source_signature(path):
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+def float_decimals(values, max_decimals=6):
+    # Smallest number of decimals that reproduces every value, or None if there is none
+    finite = values[np.isfinite(values)]
+    for decimals in range(max_decimals + 1):
+        if np.array_equal(np.round(finite, decimals), finite):
+            return decimals
+    return None
+
+def encode_column(series):
+    # Returns (array, column meta)
+    if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == object or pd.api.types.is_string_dtype(series):
+        categorical = series.astype('category')
+        categories = [str(c) for c in categorical.cat.categories]
+        codes = categorical.cat.codes.to_numpy()
+        dtype = np.int16 if len(categories) < np.iinfo(np.int16).max else np.int32
+        return codes.astype(dtype), {"kind": "category", "categories": categories, "ordered": bool(categorical.cat.ordered)}
+    if pd.api.types.is_datetime64_any_dtype(series):
+        # Keep pandas' own resolution so both read paths produce identical frames
+        return series.to_numpy(), {"kind": "datetime"}
+    if pd.api.types.is_integer_dtype(series):
+        return series.to_numpy(), {"kind": "int"}
+    values = series.to_numpy(dtype='float64')
+    decimals = float_decimals(values)
+    if decimals is not None:
+        narrow = values.astype(np.float32)
+        # float32 keeps ~7 significant digits; only narrow when rounding restores every value
+        if np.array_equal(np.round(narrow.astype('float64'), decimals), values, equal_nan=True):
+            return narrow, {"kind": "float", "decimals": decimals}
+    return values, {"kind": "float", "decimals": None}
+
+def write_columnar(frame, out_dir, source, partition, date_column=None):
+    # Sort by partition (case-insensitive, as lookups are) then date; stable, so ties keep file order
+    keys = frame[partition].astype(str).str.lower()
+    sort_frame = pd.DataFrame({"key": keys, "row": np.arange(len(frame))})
+    sort_columns = ["key"]
+    if date_column:
+        sort_frame["date"] = frame[date_column].to_numpy()
+        sort_columns.append("date")
+    order = sort_frame.sort_values(sort_columns, kind='stable')["row"].to_numpy()
+    ordered = frame.iloc[order].reset_index(drop=True)
+    sorted_keys = keys.iloc[order].reset_index(drop=True)
+
+    os.makedirs(out_dir, exist_ok=True)
+    columns = {}
+    for i, column in enumerate(ordered.columns):
+        array, meta = encode_column(ordered[column])
+        meta.update(file=f"c{i}.npy", dtype=str(array.dtype))
+        np.save(os.path.join(out_dir, meta["file"]), np.ascontiguousarray(array))
+        columns[column] = meta
+    np.save(os.path.join(out_dir, "row_order.npy"), order.astype(np.int64))
+
+    partitions = {
+        key: [int(positions[0]), int(positions[-1]) + 1]
+        for key, positions in sorted_keys.groupby(sorted_keys, sort=False).indices.items()
+    }
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "source": source_signature(source),
+        "rows": len(ordered),
+        "column_order": list(ordered.columns),
+        "columns": columns,
+        "partition": partition,
+        "date_column": date_column,
+        "partitions": partitions
+    }
+    # meta.json is written last: a directory without it is never read
+    with open(os.path.join(out_dir, "meta.json.tmp"), 'w') as f:
+        json.dump(meta, f)
+    os.replace(os.path.join(out_dir, "meta.json.tmp"), os.path.join(out_dir, "meta.json"))
+    return meta
+
+def read_meta(directory, source=None):
+    # meta.json of a columnar copy, or None if it is missing, from another format version,
+    # or older than the CSV it was made from
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format_version") != FORMAT_VERSION:
+        return None
+    if source is not None:
+        try:
+            current = source_signature(source)
+        except OSError:
+            return None
+        if current != meta["source"]:
+            return None
+    return meta
+
+def decode_column(array, meta):
+    if meta["kind"] == "category":
+        dtype = pd.CategoricalDtype(meta["categories"], ordered=meta["ordered"])
+        return pd.Categorical.from_codes(np.asarray(array), dtype=dtype)
+    if meta["kind"] == "float":
+        values = np.asarray(array, dtype='float64')
+        return np.round(values, meta["decimals"]) if meta["decimals"] is not None else values
+    return np.asarray(array)
+
+def read_columnar(directory, meta, partition=None, start=None, end=None, columns=None):
+    # Rows of one partition (case-insensitive name) and/or a [start, end] date range, in
+    # partition/date order. Only the selected rows are read from the memory-mapped column
+    # files. Returns None for an unknown partition.
+    lo, hi = 0, meta["rows"]
+    if partition is not None:
+        bounds = meta["partitions"].get(partition.lower())
+        if bounds is None:
+            return None
+        lo, hi = bounds
+
+    columns = columns or meta["column_order"]
+    mapped = {}
+    def column(name):
+        if name not in mapped:
+            mapped[name] = np.load(os.path.join(directory, meta["columns"][name]["file"]), mmap_mode='r')
+        return mapped[name]
+
+    date_column = meta.get("date_column")
+    if date_column and (start is not None or end is not None):
+        if partition is None:
+            raise ValueError("Date ranges are only supported within a partition")
+        # Dates are sorted within a partition: binary search the range
+        dates = column(date_column)[lo:hi]
+        first = int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), 'left')) if start is not None else 0
+        last = int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), 'right')) if end is not None else len(dates)
+        lo, hi = lo + first, lo + max(first, last)
+
+    data = {name: decode_column(column(name)[lo:hi], meta["columns"][name]) for name in columns}
+    return pd.DataFrame(data)
+
+def read_row_order(directory):
+    # Position in the source CSV of every stored row
+    return np.load(os.path.join(directory, "row_order.npy"))
+
+def ingest_district_dataset(csv_path=DISTRICT_CSV, out_dir=None):
+    frame = pd.read_csv(csv_path, dtype={'District': 'category'})
+    frame['Date'] = pd.to_datetime(frame['Date'])
+    return write_columnar(frame, out_dir or columnar_dir("tamil_nadu_water_quality"), csv_path, 'District', 'Date')
+
+def parse_government_csv(csv_path=GOVERNMENT_CSV):
+    # Normalized column names, text columns as categories, everything else numeric
+    # (the file writes missing values as "NAN")
+    frame = read_csv_text(csv_path, dtype=str, keep_default_na=False, na_values=['NAN'])
+    frame.columns = [GOVERNMENT_COLUMNS.get(normalize_column(c), normalize_column(c)) for c in frame.columns]
+    for column in frame.columns:
+        if column in ('location', 'state'):
+            frame[column] = frame[column].str.strip().astype('category')
+        else:
+            frame[column] = pd.to_numeric(frame[column], errors='coerce')
+    return frame
+
+def ingest_government_dataset(csv_path=GOVERNMENT_CSV, out_dir=None):
+    frame = parse_government_csv(csv_path)
+    return write_columnar(frame, out_dir or columnar_dir("government_water_data"), csv_path, 'state')
+
+INGESTERS = {
+    "tamil_nadu_water_quality": (DISTRICT_CSV, ingest_district_dataset),
+    "government_water_data": (GOVERNMENT_CSV, ingest_government_dataset)
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--datasets", default=",".join(INGESTERS), help="Comma-separated subset of: " + ", ".join(INGESTERS))
+    parser.add_argument("--check", action="store_true", help="Only report whether each columnar copy is current")
+    args = parser.parse_args()
+
+    for name in args.datasets.split(','):
+        csv_path, ingest = INGESTERS[name]
+        if args.check:
+            state = "current" if read_meta(columnar_dir(name), csv_path) else "missing or stale"
+            print(f"{name}: {state}")
+            continue
+        meta = ingest(csv_path)
+        kinds = ", ".join(f"{column} {m['dtype']}" for column, m in meta["columns"].items())
+        print(f"Ingested {csv_path} -> {columnar_dir(name)} ({meta['rows']} rows, {len(meta['partitions'])} partitions: {kinds})")
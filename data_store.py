@@ -0,0 +1,122 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+from columnar_store import columnar_dir, read_meta, read_columnar, read_row_order
+
+DATASET_FILE = os.environ.get("WATER_QUALITY_DATASET", "./dataset/tamil_nadu_water_quality_dataset.csv")
+MEASURE_COLUMNS = ['Precipitation_mm', 'Temperature_C', 'Chlorophyll_ug_L']
+# Columnar copy written by `python columnar_store.py`; used instead of parsing the CSV
+# whenever it is current, the CSV stays the source of truth and the fallback
+COLUMNAR_DIR = columnar_dir("tamil_nadu_water_quality")
+
+# Parsed dataset shared by every caller in this process.
+#   df          - rows in file order (analytics, raw data views)
+#   by_district - same rows sorted by district then date, so each district is one contiguous slice
+#   index       - lowercased district name -> (start, stop) into by_district
+#   fingerprint - content hash of df, computed on first use
+_store = {"path": None, "mtime": None, "df": None, "by_district": None, "index": {}, "fingerprint": None}
+
+def _parse(path):
+    dtypes = {column: 'float64' for column in MEASURE_COLUMNS}
+    dtypes['District'] = 'category'
+    df = pd.read_csv(path, dtype=dtypes)
+    df['Date'] = pd.to_datetime(df['Date'])
+    return df
+
+def _build_index(df):
+    keys = df['District'].astype(str).str.lower()
+    order = pd.DataFrame({'key': keys, 'Date': df['Date']}).sort_values(['key', 'Date'], kind='stable').index
+    by_district = df.loc[order].reset_index(drop=True)
+    sorted_keys = keys.loc[order].reset_index(drop=True)
+
+    index = {}
+    for key, positions in sorted_keys.groupby(sorted_keys, sort=False).indices.items():
+        index[key] = (int(positions[0]), int(positions[-1]) + 1)
+    return by_district, index
+
+def _load_columnar(path):
+    # (df, by_district, index) from the columnar copy, already sorted by district and date,
+    # or None when there is no current copy of this CSV
+    meta = read_meta(COLUMNAR_DIR, path)
+    if meta is None:
+        return None
+    by_district = read_columnar(COLUMNAR_DIR, meta)
+    df = by_district.take(np.argsort(read_row_order(COLUMNAR_DIR), kind='stable')).reset_index(drop=True)
+    index = {key: tuple(bounds) for key, bounds in meta["partitions"].items()}
+    return df, by_district, index
+
+def _refresh(path=DATASET_FILE):
+    mtime = os.path.getmtime(path)
+    if _store["df"] is None or _store["path"] != path or _store["mtime"] != mtime:
+        loaded = _load_columnar(path)
+        if loaded is None:
+            df = _parse(path)
+            by_district, index = _build_index(df)
+        else:
+            df, by_district, index = loaded
+        _store.update(path=path, mtime=mtime, df=df, by_district=by_district, index=index, fingerprint=None)
+    return _store
+
+def load_dataset(path=DATASET_FILE):
+    # Full dataset in file order; callers must treat it as read-only
+    return _refresh(path)["df"]
+
+def list_districts(path=DATASET_FILE):
+    return list(_refresh(path)["index"].keys())
+
+def get_district(district, path=DATASET_FILE):
+    # Date-sorted rows for one district, or None if the district is unknown
+    store = _refresh(path)
+    bounds = store["index"].get(district.lower())
+    if bounds is None:
+        return None
+    start, stop = bounds
+    return store["by_district"].iloc[start:stop]
+
+def _pushdown_meta(path):
+    # Metadata of the columnar copy when reads should go to it: this process has not loaded
+    # the dataset and the copy is current
+    if _store["path"] == path and _store["df"] is not None:
+        return None
+    return read_meta(COLUMNAR_DIR, path)
+
+def read_rows(district, start=None, end=None, path=DATASET_FILE, meta=None):
+    # Date-sorted rows of one district within [start, end] (e.g. "2023-01", "2024-06"), or None
+    # if the district is unknown. Reads only those rows from the columnar copy when it is
+    # current, without loading the whole dataset; otherwise filters the CSV-backed store.
+    meta = meta or _pushdown_meta(path)
+    if meta is not None:
+        return read_columnar(COLUMNAR_DIR, meta, district, start, end)
+    df = get_district(district, path)
+    if df is None or (start is None and end is None):
+        return df
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= (df['Date'] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (df['Date'] <= pd.Timestamp(end)).to_numpy()
+    return df[mask].reset_index(drop=True)
+
+def read_districts(districts, start=None, end=None, path=DATASET_FILE):
+    # {district: rows or None} for several districts, as read_rows
+    meta = _pushdown_meta(path)
+    return {district: read_rows(district, start, end, path, meta) for district in districts}
+
+def rows_fingerprint(df):
+    # Content hash of the given rows; changes whenever any date or measure changes
+    hashed = pd.util.hash_pandas_object(df[['Date'] + MEASURE_COLUMNS], index=False)
+    return hashlib.sha1(hashed.values.tobytes()).hexdigest()
+
+def dataset_fingerprint(rows=None, path=DATASET_FILE):
+    # Content hash of the whole dataset in file order (or of its first `rows` rows, to check
+    # that data was only appended); the full hash is computed once per loaded version
+    store = _refresh(path)
+    if rows is None and store["fingerprint"] is not None:
+        return store["fingerprint"]
+    df = store["df"] if rows is None else store["df"].iloc[:rows]
+    hashed = pd.util.hash_pandas_object(df[['Date', 'District'] + MEASURE_COLUMNS], index=False)
+    fingerprint = hashlib.sha1(hashed.values.tobytes()).hexdigest()
+    if rows is None:
+        store["fingerprint"] = fingerprint
+    return fingerprint
@@ -4,73 +4,139 @@ import argparse
 import json
 import warnings
 import os
-from prophet import Prophet
-from statsmodels.tsa.arima.model import ARIMA
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.inspection import permutation_importance
-from sklearn.neural_network import MLPRegressor
-from io import StringIO
+import sys
+import sqlite3
+import hashlib
+import subprocess
+import pickle
+import gzip
+import time
+import signal
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import base64
+from data_store import read_rows, read_districts, rows_fingerprint
+from cache_store import get_entry, get_entries, put_entry, claim_refresh, release_refresh, single_flight, record_coalesced, get_model_state, put_model_state, put_trajectory
+import timings
+from timings import span
 
 # Suppress warnings
 warnings.filterwarnings("ignore")
 
+# Prophet, statsmodels and scikit-learn are imported inside the functions that fit or
+# deserialize models, so cache hits, sweeps and analytics never load them
+def load_model_libraries():
+    # Import the whole model stack up front (the warm worker does this in the background)
+    import prophet.serialize
+    import statsmodels.tsa.arima.model
+    import sklearn.neural_network
+    import sklearn.preprocessing
+
+# Settings of the ensemble members. Cached forecasts are fingerprinted with this config, so
+# changing a setting (or bumping the version for code changes) refreshes them automatically.
+MODEL_CONFIG = {
+    "version": 2,
+    # Coverage of every member's yhat_lower/yhat_upper (Prophet's default 80%)
+    "interval_width": 0.8,
+    "prophet": {"weekly_seasonality": False, "daily_seasonality": False},
+    "arima": {"order": [1, 1, 1]},
+    # interval_paths: simulated paths behind the MLP's residual-bootstrap intervals
+    "lstm": {"look_back": 3, "hidden_layer_sizes": [10], "max_iter": 500, "random_state": 42, "interval_paths": 200}
+}
+
 def load_data(district):
+    # Only this district's rows: a process that has not loaded the whole dataset reads them
+    # straight from the columnar copy
     try:
-        df = pd.read_csv("./dataset/tamil_nadu_water_quality_dataset.csv")
-        df["District"] = df["District"].str.lower()
-        district = district.lower()
-        df_district = df[df["District"] == district].copy()
-        
-        if df_district.empty:
+        df_district = read_rows(district)
+        if df_district is None:
             return None, "District not found."
-            
-        # Parse Dates
-        df_district['Date'] = pd.to_datetime(df_district['Date'])
-        return df_district.sort_values('Date'), None
+        return df_district, None
     except Exception as e:
         return None, str(e)
 
+# Each member is split into a fit step, whose fitted state is persisted per district and
+# parameter, and a cheap predict step that can produce any horizon from that state.
+
+def future_dates(last_date, periods):
+    return pd.date_range(start=last_date, periods=periods+1, freq='MS')[1:]
+
 # --- Model 1: Prophet ---
-def forecast_prophet(df, column, periods):
+def fit_prophet(df, column):
+    from prophet import Prophet
     df_prophet = df[['Date', column]].rename(columns={'Date': 'ds', column: 'y'})
-    model = Prophet(weekly_seasonality=False, daily_seasonality=False)
+    model = Prophet(interval_width=MODEL_CONFIG['interval_width'], **MODEL_CONFIG['prophet'])
     model.fit(df_prophet)
-    future = model.make_future_dataframe(periods=periods, freq='MS')
+    return {"kind": "prophet", "model": model, "last_date": df['Date'].iloc[-1]}
+
+def predict_prophet(state, periods):
+    model = state["model"]
+    # Only the future rows are needed; predicting over the history as well is wasted work
+    future = model.make_future_dataframe(periods=periods, freq='MS').tail(periods)
     forecast = model.predict(future)
-    return forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].tail(periods)
+    return forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+
+def update_prophet(state, df, column, new_rows):
+    # Prophet has no online update; refit on the full history, warm-started from the previous
+    # parameters so the optimizer starts next to the old optimum
+    from prophet import Prophet
+    previous = state["model"].params
+    init = {name: previous[name][0][0] for name in ['k', 'm', 'sigma_obs']}
+    init.update({name: previous[name][0] for name in ['delta', 'beta']})
+    df_prophet = df[['Date', column]].rename(columns={'Date': 'ds', column: 'y'})
+    model = Prophet(interval_width=MODEL_CONFIG['interval_width'], **MODEL_CONFIG['prophet'])
+    model.fit(df_prophet, init=init)
+    return {"kind": "prophet", "model": model, "last_date": df['Date'].iloc[-1]}
+
+def forecast_prophet(df, column, periods):
+    return predict_prophet(fit_prophet(df, column), periods)
 
 # --- Model 2: ARIMA ---
-def forecast_arima(df, column, periods):
+def fit_arima(df, column):
     # Simple ARIMA (1,1,1) for demonstration
+    from statsmodels.tsa.arima.model import ARIMA
     series = df[column].values
-    model = ARIMA(series, order=(1, 1, 1))
-    model_fit = model.fit()
-    forecast = model_fit.forecast(steps=periods)
-    
-    # Create date index for forecast
-    last_date = df['Date'].iloc[-1]
-    forecast_dates = pd.date_range(start=last_date, periods=periods+1, freq='MS')[1:]
+    model = ARIMA(series, order=tuple(MODEL_CONFIG['arima']['order']))
+    return {"kind": "arima", "model": model.fit(), "last_date": df['Date'].iloc[-1]}
+
+def predict_arima(state, periods):
+    # Analytic prediction intervals from the state-space forecast variance
+    forecast = state["model"].get_forecast(steps=periods)
+    bounds = np.asarray(forecast.conf_int(alpha=1 - MODEL_CONFIG['interval_width']))
     
     return pd.DataFrame({
-        'ds': forecast_dates, 
-        'yhat': forecast,
-        'yhat_lower': forecast * 0.9, # Simulated bounds for non-probabilistic models
-        'yhat_upper': forecast * 1.1
+        'ds': future_dates(state["last_date"], periods), 
+        'yhat': np.asarray(forecast.predicted_mean),
+        'yhat_lower': bounds[:, 0],
+        'yhat_upper': bounds[:, 1]
     })
 
+def update_arima(state, df, column, new_rows):
+    # Extend the fitted state-space results with the new observations, keeping the parameters
+    model_fit = state["model"].append(new_rows[column].values, refit=False)
+    return {"kind": "arima", "model": model_fit, "last_date": df['Date'].iloc[-1]}
+
+def forecast_arima(df, column, periods):
+    return predict_arima(fit_arima(df, column), periods)
+
 # --- Model 3: Neural Network (LSTM Proxy) ---
 # We use MLPRegressor as a fast recurrent proxy to avoid the massive TensorFlow load & training overhead (10s+ on CPU)
-def forecast_lstm(df, column, periods):
+def fit_lstm(df, column):
+    from sklearn.preprocessing import MinMaxScaler
+    from sklearn.neural_network import MLPRegressor
     data = df[column].values.reshape(-1, 1)
     scaler = MinMaxScaler(feature_range=(0, 1))
     scaled_data = scaler.fit_transform(data)
     
     # Prepare sequences
-    look_back = 3
+    config = MODEL_CONFIG['lstm']
+    look_back = config['look_back']
     X, y = [], []
     if len(scaled_data) <= look_back:
          # Fallback if not enough data
-         return forecast_arima(df, column, periods)
+         return fit_arima(df, column)
 
     for i in range(look_back, len(scaled_data)):
         X.append(scaled_data[i-look_back:i, 0])
@@ -79,30 +145,96 @@ def forecast_lstm(df, column, periods):
     X, y = np.array(X), np.array(y)
     
     # Build Model: Fast Neural Network MLP Regressor
-    model = MLPRegressor(hidden_layer_sizes=(10,), max_iter=500, random_state=42)
+    model = MLPRegressor(hidden_layer_sizes=tuple(config['hidden_layer_sizes']), max_iter=config['max_iter'], random_state=config['random_state'])
     model.fit(X, y)
     
-    # Forecast
-    predictions = []
-    current_batch = scaled_data[-look_back:].flatten()
-    
-    for _ in range(periods):
-        current_pred = model.predict([current_batch])[0]
-        predictions.append(current_pred)
-        current_batch = np.append(current_batch[1:], current_pred)
-        
-    predictions = scaler.inverse_transform(np.array(predictions).reshape(-1, 1))
-    
-    last_date = df['Date'].iloc[-1]
-    forecast_dates = pd.date_range(start=last_date, periods=periods+1, freq='MS')[1:]
+    return {
+        "kind": "lstm",
+        "model": model,
+        "scaler": scaler,
+        "window": scaled_data[-look_back:].flatten(),
+        # In-sample one-step errors (scaled), resampled for the prediction intervals
+        "residuals": y - model.predict(X),
+        "last_date": df['Date'].iloc[-1]
+    }
+
+def simulate_paths(model, window, residuals, periods, n_paths, seed):
+    # Recursive MLP forecast for (series, look_back) windows together with n_paths noisy paths
+    # per series whose every step adds a resampled residual (series, n) of that series. All
+    # rows advance together, one predict call per step. Returns the noise-free forecast
+    # (series, periods) and the paths (series, n_paths, periods). Every series resamples the
+    # same residual positions, the ones it would draw in a forecast of its own, so a series
+    # gets the same paths whether it is simulated alone or together with others.
+    rng = np.random.default_rng(seed)
+    series, look_back = window.shape
+    rows = n_paths + 1
+    # Row 0 of each series carries the noise-free forecast
+    current = np.repeat(window[:, None, :], rows, axis=1).reshape(-1, look_back)
+    noise = residuals[:, rng.integers(0, residuals.shape[1], (n_paths, periods))]
+    noise = np.concatenate([np.zeros((series, 1, periods)), noise], axis=1).reshape(-1, periods)
+    paths = np.empty((series * rows, periods))
+    for h in range(periods):
+        paths[:, h] = model.predict(current) + noise[:, h]
+        current[:, :-1] = current[:, 1:]
+        current[:, -1] = paths[:, h]
+    paths = paths.reshape(series, rows, periods)
+    return paths[:, 0], paths[:, 1:]
+
+def path_bounds(paths):
+    # Central interval_width quantiles across the simulated paths (axis 1)
+    tail = (1 - MODEL_CONFIG['interval_width']) / 2
+    return np.quantile(paths, tail, axis=1), np.quantile(paths, 1 - tail, axis=1)
+
+def predict_lstm(state, periods):
+    if state["kind"] != "lstm":
+        return predict_arima(state, periods)
+
+    # Forecast plus residual-bootstrap paths for the intervals, from the single fit
+    config = MODEL_CONFIG['lstm']
+    forecast, paths = simulate_paths(state["model"], state["window"][None, :], state["residuals"][None, :],
+                                     periods, config['interval_paths'], config['random_state'])
+    lower, upper = path_bounds(paths)
+    inverse = lambda values: state["scaler"].inverse_transform(values.reshape(-1, 1)).flatten()
     
     return pd.DataFrame({
-        'ds': forecast_dates, 
-        'yhat': predictions.flatten(),
-        'yhat_lower': predictions.flatten() * 0.85, # Greater uncertainty for DL
-        'yhat_upper': predictions.flatten() * 1.15
+        'ds': future_dates(state["last_date"], periods), 
+        'yhat': inverse(forecast[0]),
+        'yhat_lower': inverse(lower[0]),
+        'yhat_upper': inverse(upper[0])
     })
 
+def update_lstm(state, df, column, new_rows):
+    if state["kind"] != "lstm":
+        return update_arima(state, df, column, new_rows)
+
+    # Continue training on the windows that end in the new rows, scaled with the original scaler
+    look_back = len(state["window"])
+    scaled_new = state["scaler"].transform(new_rows[column].values.reshape(-1, 1)).flatten()
+    series = np.concatenate([state["window"], scaled_new])
+    X = np.array([series[i-look_back:i] for i in range(look_back, len(series))])
+    y = series[look_back:]
+    state["model"].partial_fit(X, y)
+    residuals = np.concatenate([state["residuals"], y - state["model"].predict(X)])
+    return dict(state, window=series[-look_back:], residuals=residuals, last_date=df['Date'].iloc[-1])
+
+def forecast_lstm(df, column, periods):
+    return predict_lstm(fit_lstm(df, column), periods)
+
+def serialize_state(state):
+    if state["kind"] == "prophet":
+        # Prophet models are not reliably picklable; use its own JSON serializer
+        from prophet.serialize import model_to_json
+        state = dict(state, model=model_to_json(state["model"]))
+    return pickle.dumps(state)
+
+def deserialize_state(blob):
+    # Unpickling ARIMA/MLP states imports statsmodels/sklearn on demand
+    state = pickle.loads(blob)
+    if state["kind"] == "prophet":
+        from prophet.serialize import model_from_json
+        state["model"] = model_from_json(state["model"])
+    return state
+
 def calculate_risk(value, parameter):
     if parameter == 'Chlorophyll_ug_L':
         # E.g. > 10 is critical, > 5 warning
@@ -132,89 +264,267 @@ def get_feature_importance(df):
     except:
         return {'Precipitation': 0.5, 'Temperature': 0.5}
 
-CACHE_FILE = "./dataset/forecast_cache.json"
+def config_fingerprint():
+    return hashlib.sha1(json.dumps(MODEL_CONFIG, sort_keys=True).encode()).hexdigest()[:16]
 
-def load_cache():
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, 'r') as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
+def forecast_fingerprint(df):
+    # Identifies the inputs of a cached forecast: the district's rows plus the model settings
+    return hashlib.sha1((config_fingerprint() + rows_fingerprint(df)).encode()).hexdigest()[:16]
 
-def save_cache(cache):
-    try:
-        with open(CACHE_FILE, 'w') as f:
-            json.dump(cache, f, indent=2)
-    except Exception as e:
-        pass
+def schedule_refresh(district, start_date_str, end_date_str, cache_key):
+    # Stale-while-revalidate: recompute in a detached process while the stale entry keeps being
+    # served. claim_refresh also caps how many of these processes run at once (MAX_REFRESHES).
+    if not claim_refresh(cache_key):
+        return
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--district", district,
+         "--start", start_date_str, "--end", end_date_str, "--refresh", "--claimed"],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
 
-def forecast_ensemble(district, start_date_str, end_date_str, precip_factor=1.0, temp_bias=0.0):
-    df, error = load_data(district)
-    if error: return {"error": error}
-    
+def forecast_periods(df, end_date_str):
     # Determine number of months to forecast
     last_date = df['Date'].iloc[-1]
     target_date = pd.to_datetime(end_date_str)
     
     if target_date <= last_date:
-        periods = 6
+        return 6
+    periods = (target_date.year - last_date.year) * 12 + (target_date.month - last_date.month)
+    return max(periods, 1)
+
+def cache_key_for(district, periods):
+    return f"{district.lower()}_{periods}"
+
+# Members fitted for every parameter as (fit, predict, update) triples; predict returns
+# ds/yhat/yhat_lower/yhat_upper for `periods` months, update folds appended rows into a state
+PARAMETERS = ['Precipitation_mm', 'Temperature_C', 'Chlorophyll_ug_L']
+MEMBERS = {
+    'prophet': (fit_prophet, predict_prophet, update_prophet),
+    'arima': (fit_arima, predict_arima, update_arima),
+    'lstm': (fit_lstm, predict_lstm, update_lstm)
+}
+
+def incremental_update(previous, df, param, update):
+    # Only valid when the model settings are unchanged and the rows the state was fitted on
+    # are an unchanged prefix of the current data; returns None when a cold fit is needed
+    n_rows = previous.get("n_rows")
+    if previous.get("config") != config_fingerprint() or n_rows is None or len(df) <= n_rows:
+        return None
+    if rows_fingerprint(df.iloc[:n_rows]) != previous["rows_hash"]:
+        return None
+    try:
+        return update(previous, df, param, df.iloc[n_rows:])
+    except Exception as e:
+        print(f"Warning: incremental update failed, refitting: {e}", file=sys.stderr)
+        return None
+
+def trajectory_frame(trajectory, periods):
+    frame = pd.DataFrame(trajectory).head(periods)
+    frame['ds'] = pd.to_datetime(frame['ds'])
+    return frame
+
+def model_key(district, param, member):
+    return f"{district.lower()}|{param}|{member}"
+
+def member_forecast(district, df, param, member, periods, fingerprint, refit=False):
+    # Fit once per (district, parameter, member) and serve any horizon from the stored state.
+    # Shorter horizons are sliced from the stored trajectory; longer ones extend it.
+    return fitted_member(district, df, param, member, periods, fingerprint, refit, need_state=False)[0]
+
+def fitted_member(district, df, param, member, periods, fingerprint, refit=False, need_state=True):
+    # (forecast, fitted state) as member_forecast; the state is the in-memory one this call
+    # fitted or loaded, so callers never depend on the store write having succeeded.
+    # With need_state=False a stored trajectory is served without deserializing the state.
+    fit, predict, update = MEMBERS[member]
+    key = model_key(district, param, member)
+    with span("model_load"):
+        record = None if refit else get_model_state(key)
+
+    if record is not None and record["fingerprint"] == fingerprint:
+        trajectory = record["trajectory"]
+        if len(trajectory["ds"]) >= periods:
+            state = None
+            if need_state:
+                with span("deserialize"):
+                    state = deserialize_state(record["state"])
+            return trajectory_frame(trajectory, periods), state
+        with span("deserialize"):
+            state = deserialize_state(record["state"])
+        with span("predict"):
+            forecast = predict(state, periods)
+        known = len(trajectory["ds"])
+        # Keep the already-served prefix so extending never changes earlier months
+        for column in ['yhat', 'yhat_lower', 'yhat_upper']:
+            forecast[column] = np.concatenate([trajectory[column], forecast[column].values[known:]])
+        save = lambda t: put_trajectory(key, fingerprint, t)
     else:
-        periods = (target_date.year - last_date.year) * 12 + (target_date.month - last_date.month)
-        if periods < 1: periods = 1
+        # New rows appended since the last fit are folded in incrementally when possible
+        state = None
+        if record is not None:
+            with span("update"):
+                state = incremental_update(deserialize_state(record["state"]), df, param, update)
+        if state is None:
+            with span("fit"):
+                state = fit(df, param)
+        state.update(n_rows=len(df), rows_hash=rows_fingerprint(df), config=config_fingerprint())
+        with span("predict"):
+            forecast = predict(state, periods)
+        save = lambda t: put_model_state(key, fingerprint, serialize_state(state), t)
 
-    cache_key = f"{district.lower()}_{periods}"
-    cache = load_cache()
-    
-    if cache_key in cache:
-        cached = cache[cache_key]
-        
-        # Calculate simulated precipitation and temperature
-        sim_precip = np.array(cached['Precip_baseline']) * precip_factor
-        sim_temp = np.array(cached['Temp_baseline']) + temp_bias
-        
-        sim_precip_avg = np.mean(sim_precip)
-        sim_temp_avg = np.mean(sim_temp)
-        
-        precip_change_ratio = (sim_precip_avg / cached['hist_precip_avg']) if cached['hist_precip_avg'] else 1.0
-        temp_change_ratio = (sim_temp_avg / cached['hist_temp_avg']) if cached['hist_temp_avg'] else 1.0
-        
-        impact_factor = (precip_change_ratio * cached['explainability']['Precipitation']) + \
-                        (temp_change_ratio * cached['explainability']['Temperature'])
-        
-        chl_simulated = np.array(cached['Chl_baseline']) * impact_factor
-        
-        results = {
-            "metrics": cached["metrics"],
-            "stats": cached["stats"],
-            "Precipitation_mm": [{"ds": ds, "yhat": val} for ds, val in zip(cached["ds"], sim_precip)],
-            "Temperature_C": [{"ds": ds, "yhat": val} for ds, val in zip(cached["ds"], sim_temp)],
-            "Chlorophyll_ug_L": [
-                {
-                    "ds": ds,
-                    "yhat": chl_val,
-                    "yhat_baseline": chl_base,
-                    "yhat_lower": chl_low * impact_factor,
-                    "yhat_upper": chl_up * impact_factor,
-                    "yhat_prophet": chl_prophet * impact_factor,
-                    "yhat_arima": chl_arima * impact_factor,
-                    "yhat_lstm": chl_lstm * impact_factor
-                } for ds, chl_val, chl_base, chl_low, chl_up, chl_prophet, chl_arima, chl_lstm in zip(
-                    cached["ds"],
-                    chl_simulated,
-                    cached["Chl_baseline"],
-                    cached["Chl_lower"],
-                    cached["Chl_upper"],
-                    cached["Chl_prophet"],
-                    cached["Chl_arima"],
-                    cached["Chl_lstm"]
-                )
-            ],
-            "explainability": cached["explainability"],
-            "risk_status": calculate_risk(chl_simulated[-1], 'Chlorophyll_ug_L')
-        }
-        return results
+    trajectory = {
+        "ds": list(forecast['ds'].dt.strftime('%Y-%m-%d').values),
+        "yhat": [float(v) for v in forecast['yhat'].values],
+        "yhat_lower": [float(v) for v in forecast['yhat_lower'].values],
+        "yhat_upper": [float(v) for v in forecast['yhat_upper'].values]
+    }
+    try:
+        with span("model_save"):
+            save(trajectory)
+    except sqlite3.Error as e:
+        print(f"Warning: could not store fitted model {key}: {e}", file=sys.stderr)
+    return forecast.reset_index(drop=True), state
+
+# Cold fits can run the nine (parameter, member) fits on a process pool instead of one after
+# another (FORECAST_FIT_WORKERS, default 1 = sequential in-process). Each fit gets
+# FORECAST_FIT_TIMEOUT seconds; a fit that fails or times out is replaced by the average of
+# the other members of its parameter, and such a forecast is served but not cached.
+FIT_WORKERS = int(os.environ.get("FORECAST_FIT_WORKERS", "1"))
+FIT_TIMEOUT_S = float(os.environ.get("FORECAST_FIT_TIMEOUT", "120"))
+# A pool fit that has not returned this long after its own timeout is stuck in native code
+# (where the alarm cannot interrupt it): its pool is killed and the other running fits retried
+FIT_KILL_GRACE_S = 10
+# Thread pools capped to one thread per fit process so parallel fits do not oversubscribe the cores
+THREAD_LIMIT_VARS = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS',
+                     'NUMEXPR_NUM_THREADS', 'STAN_NUM_THREADS']
+
+def limit_threads(threads=1):
+    # Pool initializer. The variables cover processes that load the libraries afterwards (and
+    # CmdStan, which Prophet runs as a subprocess); threadpoolctl caps the BLAS/OpenMP pools
+    # already loaded in a forked worker.
+    for var in THREAD_LIMIT_VARS:
+        os.environ[var] = str(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=threads)
+    except ImportError:
+        pass
+
+@contextmanager
+def fit_deadline(seconds):
+    # Raises TimeoutError inside the fit once `seconds` have passed. Needs SIGALRM and the
+    # main thread; elsewhere the fit runs unbounded.
+    if not hasattr(signal, 'setitimer') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    def expire(signum, frame):
+        raise TimeoutError(f"timed out after {seconds:g}s")
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def fit_member(district, df, param, member, periods, fingerprint, refit):
+    with span(f"{member}:{param}"), fit_deadline(FIT_TIMEOUT_S):
+        return member_forecast(district, df, param, member, periods, fingerprint, refit)
+
+def fit_member_task(district, df, param, member, periods, fingerprint, refit, timed):
+    # Runs in a pool worker on the rows the caller passed in (not the worker's own data store,
+    # which may differ from them). Returns the forecast with the worker's timing spans (None
+    # unless the parent is recording).
+    if timed:
+        timings.start()
+    forecast = fit_member(district, df, param, member, periods, fingerprint, refit)
+    return forecast, timings.collect()
+
+def fit_members_parallel(district, df, periods, fingerprint, refit, workers):
+    # ({(param, member): forecast}, {(param, member): reason}) for the fits that completed/failed.
+    # Only `workers` fits are submitted at a time, so each starts right away and its deadline
+    # counts from submission. Each fit times itself out (fit_deadline); one that overruns its
+    # deadline by FIT_KILL_GRACE_S has its pool's processes killed and the pool replaced.
+    queue = [(param, member) for param in PARAMETERS for member in MEMBERS]
+    forecasts, failures = {}, {}
+    timed = timings.recording()
+    # Forked workers inherit the libraries instead of each importing them again
+    load_model_libraries()
+    while queue:
+        existing = {process.pid for process in multiprocessing.active_children()}
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(queue)), initializer=limit_threads)
+        pending, stuck = {}, False
+        try:
+            while (queue or pending) and not stuck:
+                while queue and len(pending) < workers:
+                    param, member = queue.pop(0)
+                    future = pool.submit(fit_member_task, district, df, param, member, periods, fingerprint, refit, timed)
+                    pending[future] = ((param, member), time.monotonic() + FIT_TIMEOUT_S + FIT_KILL_GRACE_S)
+                next_deadline = min(deadline for _, deadline in pending.values())
+                done, _ = wait(pending, timeout=max(next_deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, _ = pending.pop(future)
+                    try:
+                        forecasts[key], recorded = future.result()
+                        timings.merge(recorded)
+                    except Exception as e:
+                        failures[key] = str(e)
+                now = time.monotonic()
+                for future, (key, deadline) in list(pending.items()):
+                    if deadline <= now:
+                        failures[key] = f"timed out after {FIT_TIMEOUT_S:g}s"
+                        del pending[future]
+                        stuck = True
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if stuck:
+            # A running fit cannot be cancelled: kill the pool's processes (the children that
+            # appeared with it) and rerun the fits that were sharing it on a fresh pool
+            for process in multiprocessing.active_children():
+                if process.pid not in existing:
+                    process.kill()
+                    process.join()
+            queue[:0] = [key for key, _ in pending.values()]
+    return forecasts, failures
+
+def fill_failed_members(forecasts, failures):
+    # Stand in for each failed member with the average of its parameter's other members
+    for (param, member), reason in failures.items():
+        print(f"Warning: {member} fit for {param} failed, using the other members: {reason}", file=sys.stderr)
+    for param in PARAMETERS:
+        fitted = [forecasts[(param, member)] for member in MEMBERS if (param, member) in forecasts]
+        if not fitted:
+            raise RuntimeError(f"Every model fit failed for {param}")
+        for member in MEMBERS:
+            if (param, member) in forecasts:
+                continue
+            fallback = fitted[0].copy()
+            for column in ['yhat', 'yhat_lower', 'yhat_upper']:
+                fallback[column] = sum(frame[column].values for frame in fitted) / len(fitted)
+            fallback.attrs["fallback"] = True
+            forecasts[(param, member)] = fallback
+    return forecasts
+
+def fit_members(district, df, periods, fingerprint, refit=False, workers=None):
+    workers = FIT_WORKERS if workers is None else workers
+    if workers > 1:
+        with span("parallel"):
+            forecasts, failures = fit_members_parallel(district, df, periods, fingerprint, refit, workers)
+        return fill_failed_members(forecasts, failures)
+
+    forecasts, failures = {}, {}
+    for param in PARAMETERS:
+        for member in MEMBERS:
+            try:
+                forecasts[(param, member)] = fit_member(district, df, param, member, periods, fingerprint, refit)
+            except Exception as e:
+                failures[(param, member)] = str(e)
+    return fill_failed_members(forecasts, failures)
+
+def build_cache_entry(df, periods, forecasts, fingerprint):
+    # Reduce the nine member forecasts to the baselines a forecast response is rendered from
+    def ensemble(param, column='yhat'):
+        return sum(forecasts[(param, member)][column].values for member in MEMBERS) / 3
 
     # 0. PERFORMANCE METRICS (Academic Rigor)
     # Mocking standard metrics based on historical validation
@@ -227,7 +537,21 @@ def forecast_ensemble(district, start_date_str, end_date_str, precip_factor=1.0,
     r2 = round(1 - (np.sum((y_true - np.mean(y_true))**2) / np.sum((y_true - np.mean(y_true).mean())**2)), 3)
     if r2 < 0.8: r2 = 0.892 # Ensure presentation-ready quality for university demo
 
-    results = {
+    chl = forecasts[('Chlorophyll_ug_L', 'prophet')]
+    entry = {
+        "fingerprint": fingerprint,
+        "ds": list(chl['ds'].dt.strftime('%Y-%m-%d').values),
+        "Precip_baseline": [float(v) for v in ensemble('Precipitation_mm')],
+        "Temp_baseline": [float(v) for v in ensemble('Temperature_C')],
+        "Chl_baseline": [float(v) for v in ensemble('Chlorophyll_ug_L')],
+        "Chl_lower": [float(v) for v in ensemble('Chlorophyll_ug_L', 'yhat_lower')],
+        "Chl_upper": [float(v) for v in ensemble('Chlorophyll_ug_L', 'yhat_upper')],
+        "Chl_prophet": [float(v) for v in forecasts[('Chlorophyll_ug_L', 'prophet')]['yhat'].values],
+        "Chl_arima": [float(v) for v in forecasts[('Chlorophyll_ug_L', 'arima')]['yhat'].values],
+        "Chl_lstm": [float(v) for v in forecasts[('Chlorophyll_ug_L', 'lstm')]['yhat'].values],
+        "hist_precip_avg": float(df['Precipitation_mm'].mean()),
+        "hist_temp_avg": float(df['Temperature_C'].mean()),
+        "explainability": get_feature_importance(df),
         "metrics": {
             "mae": mae,
             "mse": mse,
@@ -241,107 +565,432 @@ def forecast_ensemble(district, start_date_str, end_date_str, precip_factor=1.0,
             "range": f"{round(df['Chlorophyll_ug_L'].min(), 2)} - {round(df['Chlorophyll_ug_L'].max(), 2)}"
         }
     }
+    fallback = [f"{member}:{param}" for (param, member), frame in forecasts.items() if frame.attrs.get("fallback")]
+    if fallback:
+        entry["fallback_members"] = fallback
+    return entry
+
+# Response layouts: "records" (one dict per month, used by the dashboard views) or "columnar"
+# (one ds array plus one array per series, optionally rounded to `precision` decimals)
+RESPONSE_FORMATS = ('records', 'columnar')
+# Scenario sweeps: chlorophyll risk classes (calculate_risk order) and the largest grid served
+RISK_LEVELS = ["Safe", "Warning", "Critical"]
+MAX_SWEEP_POINTS = 10000
+
+def render_columnar(cached, sim_precip, sim_temp, chl_simulated, impact_factor, risk_status, precision=None):
+    def column(values):
+        values = np.asarray(values, dtype='float64')
+        return (np.round(values, precision) if precision is not None else values).tolist()
+
+    return {
+        "format": "columnar",
+        "metrics": cached["metrics"],
+        "stats": cached["stats"],
+        "ds": cached["ds"],
+        "Precipitation_mm": {"yhat": column(sim_precip)},
+        "Temperature_C": {"yhat": column(sim_temp)},
+        "Chlorophyll_ug_L": {
+            "yhat": column(chl_simulated),
+            "yhat_baseline": column(cached["Chl_baseline"]),
+            "yhat_lower": column(np.array(cached["Chl_lower"]) * impact_factor),
+            "yhat_upper": column(np.array(cached["Chl_upper"]) * impact_factor),
+            "yhat_prophet": column(np.array(cached["Chl_prophet"]) * impact_factor),
+            "yhat_arima": column(np.array(cached["Chl_arima"]) * impact_factor),
+            "yhat_lstm": column(np.array(cached["Chl_lstm"]) * impact_factor)
+        },
+        "explainability": cached["explainability"],
+        "risk_status": risk_status
+    }
+
+def render_forecast(cached, precip_factor=1.0, temp_bias=0.0, response_format="records", precision=None):
+    # Apply the what-if weather scenario to cached baselines
+    # Calculate simulated precipitation and temperature
+    sim_precip = np.array(cached['Precip_baseline']) * precip_factor
+    sim_temp = np.array(cached['Temp_baseline']) + temp_bias
     
-    # --- PROJECTION LOGIC ---
-    weather_forecasts = {}
-    precip_baseline = None
-    temp_baseline = None
-    
-    for param in ['Precipitation_mm', 'Temperature_C']:
-        f_prophet = forecast_prophet(df, param, periods)
-        f_arima = forecast_arima(df, param, periods)
-        f_lstm = forecast_lstm(df, param, periods)
-        
-        # Ensemble Baseline
-        baseline = (f_prophet['yhat'].values + f_arima['yhat'].values + f_lstm['yhat'].values) / 3
-        
-        if param == 'Precipitation_mm':
-            precip_baseline = baseline
-            simulated = baseline * precip_factor
-        elif param == 'Temperature_C':
-            temp_baseline = baseline
-            simulated = baseline + temp_bias
-            
-        weather_forecasts[param] = simulated
-        
-        combined = f_prophet[['ds']].copy()
-        combined['yhat'] = simulated
-        combined['ds'] = combined['ds'].dt.strftime('%Y-%m-%d')
-        results[param] = combined.to_dict(orient='records')
-
-    # --- CHLOROPHYLL PREDICTION ---
-    param = 'Chlorophyll_ug_L'
-    f_prophet = forecast_prophet(df, param, periods)
-    f_arima = forecast_arima(df, param, periods)
-    f_lstm = forecast_lstm(df, param, periods)
-    chl_baseline = (f_prophet['yhat'].values + f_arima['yhat'].values + f_lstm['yhat'].values) / 3
-    
-    importance = get_feature_importance(df)
-    
-    hist_precip_avg = df['Precipitation_mm'].mean()
-    hist_temp_avg = df['Temperature_C'].mean()
-    
-    sim_precip_avg = np.mean(weather_forecasts['Precipitation_mm'])
-    sim_temp_avg = np.mean(weather_forecasts['Temperature_C'])
-    
-    precip_change_ratio = (sim_precip_avg / hist_precip_avg) if hist_precip_avg else 1.0
-    temp_change_ratio = (sim_temp_avg / hist_temp_avg) if hist_temp_avg else 1.0
+    sim_precip_avg = np.mean(sim_precip)
+    sim_temp_avg = np.mean(sim_temp)
     
-    impact_factor = (precip_change_ratio * importance['Precipitation']) + \
-                    (temp_change_ratio * importance['Temperature'])
-                    
-    chl_simulated = chl_baseline * impact_factor
+    precip_change_ratio = (sim_precip_avg / cached['hist_precip_avg']) if cached['hist_precip_avg'] else 1.0
+    temp_change_ratio = (sim_temp_avg / cached['hist_temp_avg']) if cached['hist_temp_avg'] else 1.0
     
-    combined = f_prophet[['ds']].copy()
-    combined['yhat'] = chl_simulated
-    combined['yhat_baseline'] = chl_baseline
-    combined['yhat_lower'] = (f_prophet['yhat_lower'].values + f_arima['yhat_lower'].values + f_lstm['yhat_lower'].values) / 3 * impact_factor
-    combined['yhat_upper'] = (f_prophet['yhat_upper'].values + f_arima['yhat_upper'].values + f_lstm['yhat_upper'].values) / 3 * impact_factor
+    impact_factor = (precip_change_ratio * cached['explainability']['Precipitation']) + \
+                    (temp_change_ratio * cached['explainability']['Temperature'])
     
-    combined['yhat_prophet'] = f_prophet['yhat'].values * impact_factor
-    combined['yhat_arima'] = f_arima['yhat'].values * impact_factor
-    combined['yhat_lstm'] = f_lstm['yhat'].values * impact_factor
+    chl_simulated = np.array(cached['Chl_baseline']) * impact_factor
     
-    combined['ds'] = combined['ds'].dt.strftime('%Y-%m-%d')
-    results['Chlorophyll_ug_L'] = combined.to_dict(orient='records')
+    if response_format == "columnar":
+        risk_status = calculate_risk(chl_simulated[-1], 'Chlorophyll_ug_L')
+        return render_columnar(cached, sim_precip, sim_temp, chl_simulated, impact_factor, risk_status, precision)
 
-    results['explainability'] = importance
-    
-    last_val = results['Chlorophyll_ug_L'][-1]['yhat']
-    results['risk_status'] = calculate_risk(last_val, 'Chlorophyll_ug_L')
-    
-    # Cache the baseline values for future fast requests
-    cache_entry = {
-        "ds": list(combined['ds'].values),
-        "Precip_baseline": [float(v) for v in precip_baseline],
-        "Temp_baseline": [float(v) for v in temp_baseline],
-        "Chl_baseline": [float(v) for v in chl_baseline],
-        "Chl_lower": [float(v) for v in (f_prophet['yhat_lower'].values + f_arima['yhat_lower'].values + f_lstm['yhat_lower'].values) / 3],
-        "Chl_upper": [float(v) for v in (f_prophet['yhat_upper'].values + f_arima['yhat_upper'].values + f_lstm['yhat_upper'].values) / 3],
-        "Chl_prophet": [float(v) for v in f_prophet['yhat'].values],
-        "Chl_arima": [float(v) for v in f_arima['yhat'].values],
-        "Chl_lstm": [float(v) for v in f_lstm['yhat'].values],
-        "hist_precip_avg": float(hist_precip_avg),
-        "hist_temp_avg": float(hist_temp_avg),
-        "explainability": importance,
-        "metrics": results["metrics"],
-        "stats": results["stats"]
+    return {
+        "metrics": cached["metrics"],
+        "stats": cached["stats"],
+        "Precipitation_mm": [{"ds": ds, "yhat": val} for ds, val in zip(cached["ds"], sim_precip)],
+        "Temperature_C": [{"ds": ds, "yhat": val} for ds, val in zip(cached["ds"], sim_temp)],
+        "Chlorophyll_ug_L": [
+            {
+                "ds": ds,
+                "yhat": chl_val,
+                "yhat_baseline": chl_base,
+                "yhat_lower": chl_low * impact_factor,
+                "yhat_upper": chl_up * impact_factor,
+                "yhat_prophet": chl_prophet * impact_factor,
+                "yhat_arima": chl_arima * impact_factor,
+                "yhat_lstm": chl_lstm * impact_factor
+            } for ds, chl_val, chl_base, chl_low, chl_up, chl_prophet, chl_arima, chl_lstm in zip(
+                cached["ds"],
+                chl_simulated,
+                cached["Chl_baseline"],
+                cached["Chl_lower"],
+                cached["Chl_upper"],
+                cached["Chl_prophet"],
+                cached["Chl_arima"],
+                cached["Chl_lstm"]
+            )
+        ],
+        "explainability": cached["explainability"],
+        "risk_status": calculate_risk(chl_simulated[-1], 'Chlorophyll_ug_L')
     }
+
+def store_cache_entry(cache_key, cache_entry):
+    if cache_entry.get("fallback_members"):
+        # Stand-in members are not cached, so the next request fits them again
+        return
+    try:
+        put_entry(cache_key, cache_entry)
+    except sqlite3.Error as e:
+        print(f"Warning: could not write forecast cache entry {cache_key}: {e}", file=sys.stderr)
+
+def forecast_baselines(district, start_date_str, end_date_str, refresh=False, refit=False, claimed=False):
+    # (cache entry, error): the cached baselines for the request, fitted and stored on a miss.
+    # refresh skips the cache read and recomputes; claimed means the caller took the entry's
+    # refresh claim (claim_refresh) and it is released here, whether or not an entry is stored.
+    with span("load_data"):
+        df, error = load_data(district)
+    if error: return None, error
     
-    cache[cache_key] = cache_entry
-    save_cache(cache)
+    periods = forecast_periods(df, end_date_str)
+    cache_key = cache_key_for(district, periods)
+    with span("fingerprint"):
+        fingerprint = forecast_fingerprint(df)
+    with span("cache_read"):
+        cached = None if refresh or refit else get_entry(cache_key)
     
-    return results
+    if cached is not None:
+        if cached.get('fingerprint') != fingerprint:
+            with span("schedule_refresh"):
+                schedule_refresh(district, start_date_str, end_date_str, cache_key)
+        return cached, None
+
+    # Single flight: one process computes a key at a time; a request that waited for another
+    # one computing the same key serves that result instead of fitting again
+    with single_flight(cache_key) as waited:
+        if waited and not refit:
+            cached = get_entry(cache_key, track=False)
+            if cached is not None and cached.get('fingerprint') == fingerprint:
+                record_coalesced()
+                return cached, None
+
+        # Cache the baseline values for future fast requests
+        try:
+            with span("fit_members"):
+                try:
+                    forecasts = fit_members(district, df, periods, fingerprint, refit)
+                except RuntimeError as e:
+                    return None, str(e)
+            with span("build_cache_entry"):
+                cache_entry = build_cache_entry(df, periods, forecasts, fingerprint)
+            with span("cache_write"):
+                store_cache_entry(cache_key, cache_entry)
+            return cache_entry, None
+        finally:
+            # A background refresh frees its slot even when nothing was stored
+            if claimed:
+                release_refresh(cache_key)
+
+def forecast_ensemble(district, start_date_str, end_date_str, precip_factor=1.0, temp_bias=0.0, refresh=False, refit=False,
+                      response_format="records", precision=None, claimed=False):
+    if response_format not in RESPONSE_FORMATS:
+        return {"error": f"Unknown format: {response_format}"}
+    cached, error = forecast_baselines(district, start_date_str, end_date_str, refresh, refit, claimed)
+    if error: return {"error": error}
+    with span("render"):
+        return render_forecast(cached, precip_factor, temp_bias, response_format, precision)
+
+def grid_number(text, spec):
+    try:
+        value = float(text)
+    except ValueError:
+        raise ValueError(f"Not a number: {text.strip()!r} in {spec!r}") from None
+    if not np.isfinite(value):
+        raise ValueError(f"Not a finite number: {text.strip()!r} in {spec!r}")
+    return value
+
+def parse_grid(spec, max_points=MAX_SWEEP_POINTS):
+    # "0.5:1.5:11" -> 11 evenly spaced values from 0.5 to 1.5; "0.8,1,1.2" -> those values.
+    # The point count is checked against max_points before anything is allocated.
+    if ':' in spec:
+        parts = spec.split(':')
+        if len(parts) != 3:
+            raise ValueError(f"Expected start:stop:num, got {spec!r}")
+        try:
+            num = int(parts[2])
+        except ValueError:
+            raise ValueError(f"Point count must be an integer: {parts[2].strip()!r} in {spec!r}") from None
+        if num < 1:
+            raise ValueError(f"Grid needs at least one point: {spec!r}")
+        if num > max_points:
+            raise ValueError(f"Grid has {num} points, max {max_points}")
+        return np.linspace(grid_number(parts[0], spec), grid_number(parts[1], spec), num)
+    if spec.count(',') >= max_points:
+        raise ValueError(f"Grid has more than {max_points} points")
+    values = [grid_number(value, spec) for value in spec.split(',') if value.strip()]
+    if not values:
+        raise ValueError(f"Grid needs at least one point: {spec!r}")
+    return np.array(values)
+
+def parse_grids(precip_spec, temp_spec):
+    # Both axes of a sweep; the second axis is bounded by what the first leaves of MAX_SWEEP_POINTS
+    precip_grid = parse_grid(precip_spec)
+    return precip_grid, parse_grid(temp_spec, MAX_SWEEP_POINTS // precip_grid.size)
+
+def sweep_matrix(cached, precip_factors, temp_biases):
+    # Every (precip_factor, temp_bias) scenario at once: render_forecast's impact factor
+    # broadcast over the grid. Returns impact (P, T) and the simulated chlorophyll (P, T, months).
+    precip = np.asarray(precip_factors, dtype='float64')[:, None]
+    temp = np.asarray(temp_biases, dtype='float64')[None, :]
+    precip_avg = np.mean(cached['Precip_baseline'])
+    temp_avg = np.mean(cached['Temp_baseline'])
+    # Scaling the series by a constant scales its mean, so the scenario means come straight from the baseline means
+    precip_change_ratio = precip_avg * precip / cached['hist_precip_avg'] if cached['hist_precip_avg'] else np.ones_like(precip)
+    temp_change_ratio = (temp_avg + temp) / cached['hist_temp_avg'] if cached['hist_temp_avg'] else np.ones_like(temp)
+    impact = precip_change_ratio * cached['explainability']['Precipitation'] + \
+             temp_change_ratio * cached['explainability']['Temperature']
+    chl = impact[:, :, None] * np.asarray(cached['Chl_baseline'], dtype='float64')
+    return impact, chl
+
+def risk_codes(values):
+    # Vectorized calculate_risk for chlorophyll: index into RISK_LEVELS
+    return np.select([values > 10, values > 5], [2, 1], 0)
+
+def forecast_sweep(district, start_date_str, end_date_str, precip_factors, temp_biases, precision=None, trajectories=True):
+    # Sensitivity surface over a precip_factor x temp_bias grid from one set of cached baselines.
+    # Matrices are indexed [precip_factor][temp_bias]; "risk" holds indices into "risk_levels"
+    # for the final month (the single-scenario risk_status), "trajectories" [p][t][month].
+    precip_factors = np.atleast_1d(np.asarray(precip_factors, dtype='float64'))
+    temp_biases = np.atleast_1d(np.asarray(temp_biases, dtype='float64'))
+    if precip_factors.size == 0 or temp_biases.size == 0:
+        return {"error": "Empty scenario grid"}
+    if precip_factors.size * temp_biases.size > MAX_SWEEP_POINTS:
+        return {"error": f"Scenario grid too large ({precip_factors.size}x{temp_biases.size}, max {MAX_SWEEP_POINTS} points)"}
+    cached, error = forecast_baselines(district, start_date_str, end_date_str)
+    if error: return {"error": error}
+
+    with span("sweep"):
+        impact, chl = sweep_matrix(cached, precip_factors, temp_biases)
+        def matrix(values):
+            return (np.round(values, precision) if precision is not None else values).tolist()
+        output = {
+            "format": "sweep",
+            "district": district,
+            "metrics": cached["metrics"],
+            "ds": cached["ds"],
+            "precip_factors": precip_factors.tolist(),
+            "temp_biases": temp_biases.tolist(),
+            "yhat_baseline": matrix(np.asarray(cached["Chl_baseline"], dtype='float64')),
+            "impact_factor": matrix(impact),
+            "final": matrix(chl[:, :, -1]),
+            "peak": matrix(chl.max(axis=2)),
+            "risk_levels": RISK_LEVELS,
+            "risk": risk_codes(chl[:, :, -1]).tolist()
+        }
+        if trajectories:
+            output["trajectories"] = matrix(chl)
+    return output
+
+def batch_worker_init():
+    # Misses of a batch are already spread over processes; fit each one's members sequentially
+    global FIT_WORKERS
+    FIT_WORKERS = 1
+    limit_threads()
+
+def batch_item(district, output):
+    if "error" in output:
+        return {"district": district, "error": output["error"]}
+    return {"district": district, "result": output}
+
+def run_batch_jobs(jobs, workers):
+    # Yields (job, result, error) for (fn, district, args, is_refresh) jobs as they complete;
+    # an exception of one job is reported as its error and the others carry on. One job, or
+    # workers == 1, runs everything in-process.
+    if workers == 1 or len(jobs) <= 1:
+        for job in jobs:
+            fn, district, args, _ = job
+            try:
+                yield job, fn(district, *args), None
+            except Exception as e:
+                yield job, None, e
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=batch_worker_init) as pool:
+        futures = {pool.submit(fn, district, *args): (fn, district, args, is_refresh) for fn, district, args, is_refresh in jobs}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+def forecast_batch(districts, start_date_str, end_date_str, precip_factor=1.0, temp_bias=0.0, workers=1,
+                   response_format="records", precision=None):
+    # Yields one {"district", "result"} (or {"district", "error"}) per district as it completes:
+    # cache hits first, read in one bulk query and rendered in-process, then the misses, fitted
+    # in parallel on a process pool. Stale hits are served as they are and then refitted on the
+    # same pool, so a batch never starts more fits than its workers. Ends with a {"summary": ...} item.
+    # Names are matched case-insensitively; repeats of a district are answered once.
+    t_start = time.time()
+    unique = {}
+    for district in districts:
+        unique.setdefault(district.lower(), district)
+    districts = list(unique.values())
+    errors = 0
+    frames, keys = {}, {}
+    for district, df in read_districts(districts).items():
+        if df is None:
+            errors += 1
+            yield {"district": district, "error": "District not found."}
+            continue
+        frames[district] = df
+        keys[district] = cache_key_for(district, forecast_periods(df, end_date_str))
+
+    cached = get_entries(list(keys.values()))
+    misses, stale = [], []
+    for district, key in keys.items():
+        entry = cached.get(key)
+        if entry is None:
+            misses.append(district)
+            continue
+        if entry.get('fingerprint') != forecast_fingerprint(frames[district]):
+            stale.append(district)
+        yield {"district": district, "result": render_forecast(entry, precip_factor, temp_bias, response_format, precision)}
+
+    # refresh=True: misses are known misses and stale entries must be recomputed, so both skip
+    # the cache lookup (without touching any refresh claim). Stale districts were already
+    # answered; only failures are reported. A stale entry is refitted only under its refresh
+    # claim, which also counts towards MAX_REFRESHES; one already being refreshed elsewhere
+    # (or over the cap) is left as it is.
+    request = (start_date_str, end_date_str, precip_factor, temp_bias, True, False, response_format, precision)
+    refresh = (start_date_str, end_date_str, True, False, True)
+    stale_count = len(stale)
+    stale = [district for district in stale if claim_refresh(keys[district])]
+    refreshed = 0
+    jobs = [(forecast_ensemble, district, request, False) for district in misses]
+    jobs += [(forecast_baselines, district, refresh, True) for district in stale]
+    for (_, district, _, is_refresh), result, error in run_batch_jobs(jobs, workers):
+        if error is not None:
+            if is_refresh:
+                # The refresh never reached its own release (or its worker died)
+                release_refresh(keys[district])
+            else:
+                errors += 1
+            yield {"district": district, "refresh_error" if is_refresh else "error": str(error)}
+        elif not is_refresh:
+            item = batch_item(district, result)
+            errors += "error" in item
+            yield item
+        elif result[1]:
+            yield {"district": district, "refresh_error": result[1]}
+        else:
+            refreshed += 1
+
+    yield {"summary": {
+        "districts": len(districts),
+        "hits": len(keys) - len(misses),
+        "misses": len(misses),
+        "stale": stale_count,
+        "refreshed": refreshed,
+        "errors": errors,
+        "elapsed_s": round(time.time() - t_start, 3)
+    }}
+
+def compress_response(output):
+    # gzip the compact JSON body; base64 so it can travel inside the worker's JSON-lines
+    # protocol (Node sends the decoded bytes with Content-Encoding: gzip)
+    with span("compress"):
+        body = gzip.compress(json.dumps(output, separators=(',', ':')).encode('utf-8'))
+    return {"encoding": "gzip", "data": base64.b64encode(body).decode('ascii')}
+
+def forecast_json(output):
+    # Serialize a response; with timings enabled the serialization span and the whole
+    # request's spans are attached as a `_timings` block (also logged to stderr)
+    with span("serialize"):
+        text = json.dumps(output)
+    recorded = timings.collect()
+    if recorded is None:
+        return text
+    timings.log("forecast_timings", recorded)
+    output["_timings"] = recorded
+    return json.dumps(output)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--district", required=True)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--district")
+    target.add_argument("--districts", help="Comma-separated districts (or 'all'): stream one NDJSON line per district")
+    parser.add_argument("--workers", type=int, default=0, help="With --districts: process pool size for cache misses (0 = all CPUs)")
     parser.add_argument("--start", required=True)
     parser.add_argument("--end", required=True)
     parser.add_argument("--precip_factor", type=float, default=1.0)
     parser.add_argument("--temp_bias", type=float, default=0.0)
+    parser.add_argument("--refresh", action="store_true", help="Recompute and overwrite the cached forecast")
+    parser.add_argument("--fit-workers", type=int, default=FIT_WORKERS,
+                        help="Fit the nine ensemble members on this many processes on a cache miss (0 = all CPUs)")
+    parser.add_argument("--claimed", action="store_true",
+                        help="With --refresh: release the entry's background-refresh claim, taken by the process that scheduled this one")
+    parser.add_argument("--refit", action="store_true", help="Cold-fit every model instead of reusing stored fits, then overwrite the cached forecast")
+    parser.add_argument("--timings", action="store_true", help="Add per-stage timing spans as a `_timings` block (same as WQ_TIMINGS=1)")
+    parser.add_argument("--profile", metavar="PATH", help="Run the request under cProfile and dump the stats to PATH")
+    parser.add_argument("--format", choices=RESPONSE_FORMATS, default="records", help="Response layout")
+    parser.add_argument("--precision", type=int, help="Round columnar series to this many decimals")
+    parser.add_argument("--gzip", action="store_true", help="Write the response gzip-compressed (binary) to stdout")
+    parser.add_argument("--precip-grid", help="Scenario sweep: precip_factor values as start:stop:num or a comma list")
+    parser.add_argument("--temp-grid", help="Scenario sweep: temp_bias values as start:stop:num or a comma list (use --temp-grid=-2:4:25 for negative starts)")
+    parser.add_argument("--no-trajectories", action="store_true", help="Scenario sweep: only the per-scenario summary matrices")
     
     args = parser.parse_args()
+    FIT_WORKERS = args.fit_workers or os.cpu_count()
+
+    if args.districts:
+        from data_store import load_dataset
+        if args.districts == 'all':
+            districts = [str(d) for d in load_dataset()['District'].cat.categories]
+        else:
+            districts = [d.strip() for d in args.districts.split(',') if d.strip()]
+        batch = forecast_batch(districts, args.start, args.end, args.precip_factor, args.temp_bias,
+                               args.workers or os.cpu_count(), args.format, args.precision)
+        for item in batch:
+            sys.stdout.write(json.dumps(item, separators=(',', ':')) + "\n")
+            sys.stdout.flush()
+        sys.exit(0)
 
-    output = forecast_ensemble(args.district, args.start, args.end, args.precip_factor, args.temp_bias)
-    print(json.dumps(output))
+    if args.timings or timings.enabled():
+        timings.start()
+    request = (args.district, args.start, args.end, args.precip_factor, args.temp_bias, args.refresh, args.refit,
+               args.format, args.precision, args.claimed)
+    if args.precip_grid or args.temp_grid:
+        # Grids default to the single --precip_factor / --temp_bias value
+        try:
+            precip_grid, temp_grid = parse_grids(args.precip_grid or str(args.precip_factor),
+                                                 args.temp_grid or str(args.temp_bias))
+        except ValueError as e:
+            output = {"error": f"Invalid scenario grid: {e}"}
+        else:
+            output = forecast_sweep(args.district, args.start, args.end, precip_grid, temp_grid, args.precision,
+                                    not args.no_trajectories)
+    elif args.profile:
+        output = timings.profile_call(args.profile, forecast_ensemble, *request)
+    else:
+        output = forecast_ensemble(*request)
+    if args.gzip:
+        sys.stdout.buffer.write(gzip.compress(forecast_json(output).encode('utf-8')))
+    else:
+        print(forecast_json(output))
@@ -1,68 +1,137 @@
+import os
 import pandas as pd
+import numpy as np
 import argparse
 import json
-from prophet import Prophet
+import operator
 from datetime import datetime
+from data_store import get_district, load_dataset
+from ensemble_model import forecast_fingerprint, fitted_member
 
+# Alert rules, checked in this order: a forecast month on or after today whose value of
+# `series` compares to `threshold` with `op` raises `message`. Override with a JSON file of
+# the same shape via --alert-rules or FORECAST_ALERT_RULES.
+ALERT_RULES = [
+    {"series": "chlorophyll", "op": ">", "threshold": 5, "message": "High chlorophyll level ({value:.2f} µg/L) on {ds}"},
+    {"series": "temperature", "op": ">", "threshold": 35, "message": "High temperature ({value:.2f} °C) on {ds}"},
+    {"series": "precipitation", "op": "<", "threshold": 20, "message": "Low precipitation ({value:.2f} mm) on {ds}"},
+    {"series": "precipitation", "op": ">", "threshold": 300, "message": "Excess precipitation ({value:.2f} mm) on {ds}"}
+]
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+SERIES_COLUMNS = {
+    "precipitation": "Precipitation_mm",
+    "temperature": "Temperature_C",
+    "chlorophyll": "Chlorophyll_ug_L"
+}
 
-def forecast_variable(df, column_name, start, end):
-    df_prophet = df[["Date", column_name]].copy()
-    df_prophet.rename(columns={"Date": "ds", column_name: "y"}, inplace=True)
-    df_prophet["ds"] = pd.to_datetime(df_prophet["ds"])
-    model = Prophet()
-    model.fit(df_prophet)
-    future_dates = pd.date_range(start=start, end=end, freq='MS')
-    future = pd.DataFrame({"ds": future_dates})
-    forecast = model.predict(future)
-    forecast = forecast[["ds", "yhat"]]
-    forecast["ds"] = forecast["ds"].dt.strftime('%Y-%m-%d')
-    return forecast
+def load_alert_rules(path=None):
+    path = path or os.environ.get("FORECAST_ALERT_RULES")
+    if not path:
+        return ALERT_RULES
+    with open(path) as f:
+        rules = json.load(f)
+    if not isinstance(rules, list):
+        raise ValueError(f"Alert rules in {path} must be a list")
+    for index, rule in enumerate(rules):
+        problem = alert_rule_problem(rule)
+        if problem:
+            raise ValueError(f"Invalid alert rule #{index + 1} in {path} ({problem}): {rule}")
+    return rules
 
-def generate_alerts(forecasts):
-    alerts = []
-    today = datetime.today().strftime('%Y-%m-%d')
+def alert_rule_problem(rule):
+    # What is wrong with one rule, or None; checked up front so generate_alerts never fails on it
+    if not isinstance(rule, dict):
+        return "not an object"
+    if rule.get("series") not in SERIES_COLUMNS:
+        return f"series must be one of {', '.join(SERIES_COLUMNS)}"
+    if rule.get("op") not in OPERATORS:
+        return f"op must be one of {' '.join(OPERATORS)}"
+    threshold = rule.get("threshold")
+    if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or not np.isfinite(threshold):
+        return "threshold must be a number"
+    if not isinstance(rule.get("message"), str):
+        return "message must be a string"
+    try:
+        rule["message"].format(value=0.0, ds="2000-01-01")
+    except (KeyError, IndexError, ValueError) as e:
+        return f"message may only use {{value}} and {{ds}}: {e}"
+    return None
 
-    # Filter to current and future dates only
-    def is_future(ds):
-        return ds >= today
+def months_between(first, last):
+    return (last.year - first.year) * 12 + (last.month - first.month)
 
-    for record in forecasts["chlorophyll"]:
-        if is_future(record["ds"]) and record["yhat"] > 5:
-            alerts.append(f"High chlorophyll level ({record['yhat']:.2f} µg/L) on {record['ds']}")
+def forecast_variable(district, df, column_name, start, end, fingerprint):
+    # Prophet forecast for every month in [start, end], shared with the ensemble: future months
+    # come from the stored Prophet trajectory (fitted once per district and parameter), months
+    # inside the history from the same fitted model's in-sample predictions
+    dates = pd.date_range(start=start, end=end, freq='MS')
+    last_date = df['Date'].iloc[-1]
+    future = dates[dates > last_date]
+    past = dates[dates <= last_date]
+    periods = months_between(last_date, future[-1]) if len(future) else 1
 
-    for record in forecasts["temperature"]:
-        if is_future(record["ds"]) and record["yhat"] > 35:
-            alerts.append(f"High temperature ({record['yhat']:.2f} °C) on {record['ds']}")
+    forecast, state = fitted_member(district, df, column_name, 'prophet', periods, fingerprint,
+                                    need_state=len(past) > 0)
+    frames = [forecast[forecast['ds'].isin(future)][["ds", "yhat"]]]
+    if len(past):
+        frames.insert(0, state["model"].predict(pd.DataFrame({"ds": past}))[["ds", "yhat"]])
 
-    for record in forecasts["precipitation"]:
-        if is_future(record["ds"]):
-            if record["yhat"] < 20:
-                alerts.append(f"Low precipitation ({record['yhat']:.2f} mm) on {record['ds']}")
-            elif record["yhat"] > 300:
-                alerts.append(f"Excess precipitation ({record['yhat']:.2f} mm) on {record['ds']}")
+    forecast = pd.concat(frames, ignore_index=True)
+    forecast["ds"] = forecast["ds"].dt.strftime('%Y-%m-%d')
+    return forecast
+
+def generate_alerts(forecasts, rules=ALERT_RULES, today=None):
+    # forecasts: {series: frame of ds (YYYY-MM-DD strings) and yhat}. Each series' arrays are
+    # built once and each rule is one mask over them; alerts are grouped by series (in the
+    # order the rules first name them) and chronological within a series
+    today = today or datetime.today().strftime('%Y-%m-%d')
+    arrays = {}
+    hits = {}
+    for rule in rules:
+        series = rule["series"]
+        if series not in arrays:
+            ds = forecasts[series]["ds"].to_numpy(dtype=str)
+            arrays[series] = (ds, forecasts[series]["yhat"].to_numpy(dtype='float64'), ds >= today)
+        ds, values, upcoming = arrays[series]
+        if not len(ds):
+            continue
+        mask = upcoming & OPERATORS[rule["op"]](values, rule["threshold"])
+        positions = np.flatnonzero(mask)
+        hits.setdefault(series, []).extend(
+            (position, rule["message"].format(value=values[position], ds=ds[position])) for position in positions
+        )
 
+    alerts = []
+    for series_hits in hits.values():
+        alerts.extend(message for _, message in sorted(series_hits, key=lambda hit: hit[0]))
     return alerts
 
-def forecast_all(district, start, end):
-    df = pd.read_csv("./dataset/tamil_nadu_water_quality_dataset.csv")
-    df = df[df["District"].str.lower() == district.lower()]
-    if df.empty:
+def forecast_all(district, start, end, rules=ALERT_RULES):
+    df = get_district(district)
+    if df is None:
         return {"error": "District not found in dataset."}
 
-    result = {
-        "precipitation": forecast_variable(df, "Precipitation_mm", start, end).to_dict(orient="records"),
-        "temperature": forecast_variable(df, "Temperature_C", start, end).to_dict(orient="records"),
-        "chlorophyll": forecast_variable(df, "Chlorophyll_ug_L", start, end).to_dict(orient="records"),
+    fingerprint = forecast_fingerprint(df)
+    forecasts = {
+        series: forecast_variable(district, df, column, start, end, fingerprint)
+        for series, column in SERIES_COLUMNS.items()
     }
-    result['alerts'] = generate_alerts(result)
+    result = {series: forecast.to_dict(orient="records") for series, forecast in forecasts.items()}
+    result['alerts'] = generate_alerts(forecasts, rules)
     return result
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--district", required=True)
+    parser.add_argument("--district", required=True, help="District name, or 'all' for {district: result} over every district")
     parser.add_argument("--start", required=True)
     parser.add_argument("--end", required=True)
+    parser.add_argument("--alert-rules", help="JSON file with alert rules (see ALERT_RULES)")
     args = parser.parse_args()
 
-    output = forecast_all(args.district, args.start + "-01", args.end + "-01")
+    rules = load_alert_rules(args.alert_rules)
+    if args.district == 'all':
+        districts = [str(d) for d in load_dataset()['District'].cat.categories]
+        output = {district: forecast_all(district, args.start + "-01", args.end + "-01", rules) for district in districts}
+    else:
+        output = forecast_all(args.district, args.start + "-01", args.end + "-01", rules)
     print(json.dumps(output))
@@ -0,0 +1,134 @@
+import sys
+import json
+import threading
+import traceback
+
+# Imports happen once here and stay warm for every request this worker serves; the model
+# libraries are loaded in the background once the worker is ready, so cache hits and
+# analytics are served immediately
+from ensemble_model import forecast_ensemble, forecast_sweep, parse_grids, compress_response, load_model_libraries
+from get_analytics import compute_analytics
+from cache_store import cache_stats
+from station_store import query_stations, station_aggregates
+import timings
+
+# Long-lived worker: reads one JSON request per line on stdin and writes one JSON
+# response per line on stdout.
+#   request:  {"id": 1, "command": "forecast", "params": {"district": "Salem", ...}}
+#   response: {"id": 1, "result": {...}}  or  {"id": 1, "error": "..."}
+# With WQ_TIMINGS=1 each result gets a `_timings` block with the request's per-stage spans.
+
+def handle_forecast(params):
+    precision = params.get("precision")
+    output = forecast_ensemble(
+        params["district"],
+        params["start"],
+        params["end"],
+        float(params.get("precip_factor", 1.0)),
+        float(params.get("temp_bias", 0.0)),
+        response_format=params.get("format", "records"),
+        precision=None if precision is None else min(max(int(precision), 0), 12)
+    )
+    # Errors stay uncompressed so the caller can inspect them
+    if params.get("compress") and "error" not in output:
+        return compress_response(output)
+    return output
+
+def handle_sweep(params):
+    # Grids are "start:stop:num" or comma-separated values; a missing grid is the neutral scenario
+    try:
+        precip_grid, temp_grid = parse_grids(str(params.get("precip_grid", "1.0")), str(params.get("temp_grid", "0.0")))
+    except ValueError as e:
+        return {"error": f"Invalid scenario grid: {e}"}
+    precision = params.get("precision")
+    output = forecast_sweep(
+        params["district"],
+        params["start"],
+        params["end"],
+        precip_grid,
+        temp_grid,
+        precision=None if precision is None else min(max(int(precision), 0), 12),
+        trajectories=params.get("trajectories", True)
+    )
+    if params.get("compress") and "error" not in output:
+        return compress_response(output)
+    return output
+
+def handle_analytics(params):
+    return compute_analytics()
+
+def handle_stations(params):
+    # Filtered station records, or per-group aggregates with "group_by"
+    year = params.get("year")
+    if params.get("group_by"):
+        return station_aggregates(params["group_by"], params.get("state"), year)
+    return query_stations(params.get("state"), params.get("station_code"), year, int(params.get("limit", 500)))
+
+def handle_cache_stats(params):
+    return cache_stats()
+
+def handle_ping(params):
+    return {"status": "ok"}
+
+COMMANDS = {
+    "forecast": handle_forecast,
+    "sweep": handle_sweep,
+    "analytics": handle_analytics,
+    "stations": handle_stations,
+    "cache_stats": handle_cache_stats,
+    "ping": handle_ping
+}
+
+# Parameters each command cannot run without
+REQUIRED_PARAMS = {
+    "forecast": ["district", "start", "end"],
+    "sweep": ["district", "start", "end"]
+}
+
+def handle_request(request):
+    command = COMMANDS.get(request.get("command"))
+    if command is None:
+        return {"id": request.get("id"), "error": f"Unknown command: {request.get('command')}"}
+    params = request.get("params") or {}
+    missing = [name for name in REQUIRED_PARAMS.get(request["command"], []) if params.get(name) in (None, "")]
+    if missing:
+        # A result-level error, like the other invalid-input errors (the routes answer 400)
+        return {"id": request.get("id"), "result": {"error": f"Missing parameter: {missing[0]}"}}
+    if timings.enabled():
+        timings.start()
+    try:
+        result = command(params)
+    except Exception as e:
+        traceback.print_exc(file=sys.stderr)
+        timings.collect()
+        return {"id": request.get("id"), "error": str(e)}
+    recorded = timings.collect()
+    if recorded is not None and isinstance(result, dict):
+        # Results may be shared (e.g. the memoized analytics snapshot); never mutate them
+        result = dict(result, _timings=recorded)
+    return {"id": request.get("id"), "result": result}
+
+def serve(stdin, stdout):
+    # Signal the pool that imports are done and the worker is warm
+    stdout.write(json.dumps({"ready": True}) + "\n")
+    stdout.flush()
+    threading.Thread(target=load_model_libraries, daemon=True).start()
+
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            response = {"id": None, "error": f"Invalid request: {e}"}
+        else:
+            response = handle_request(request)
+        stdout.write(json.dumps(response) + "\n")
+        stdout.flush()
+
+if __name__ == "__main__":
+    # Keep stray prints from model libraries off the protocol channel
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    serve(sys.stdin, protocol_out)
@@ -1,33 +1,32 @@
-import rasterio
 import os
-import numpy as np
+import argparse
 import pandas as pd
+from raster_stats import list_rasters, raster_date, summarize_rasters
 
-data_dir = './dataset'  # Folder with your .tif files
-output = []
+# Statewide monthly means from the Earth Engine exports. Rasters are reduced in a single
+# streaming pass each (see raster_stats.py), in parallel with --workers, in natural file order.
 
-for file in sorted(os.listdir(data_dir)):
-    if file.endswith('.tif'):
-        filepath = os.path.join(data_dir, file)
-        with rasterio.open(filepath) as src:
-            data = src.read()
-            bands = src.descriptions if src.descriptions else ['chlorophyll', 'temperature', 'precipitation']
-            
-            values = {}
-            for i, band in enumerate(bands):
-                band_data = data[i]
-                band_data = np.where(band_data == src.nodata, np.nan, band_data)
-                values[band] = np.nanmean(band_data)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data-dir", default="./dataset/google-earth-engine", help="Folder with your WaterQuality_*.tif files")
+    parser.add_argument("--output", default="water_quality_dataset.csv")
+    parser.add_argument("--workers", type=int, default=0, help="Process pool size (0 = all CPUs, 1 = in-process)")
+    parser.add_argument("--all-stats", action="store_true", help="Also write per-band count, min, max and std columns")
+    args = parser.parse_args()
 
-        # Parse date from filename
-        date = file.replace('WaterQuality_', '').replace('.tif', '')
-        output.append({
-            'date': date,
-            'chlorophyll': round(values.get('chlorophyll', 0), 2),
-            'temperature': round(values.get('temperature', 0), 2),
-            'precipitation': round(values.get('precipitation', 0), 2)
-        })
+    output = []
+    paths = list_rasters(args.data_dir)
+    for filepath, stats in summarize_rasters(paths, args.workers or os.cpu_count()):
+        row = {'date': raster_date(filepath)}
+        for band in ['chlorophyll', 'temperature', 'precipitation']:
+            band_stats = stats.get(band)
+            row[band] = round(band_stats['mean'], 2) if band_stats else 0
+        if args.all_stats:
+            for band, band_stats in stats.items():
+                for name in ['count', 'min', 'max', 'std']:
+                    row[f"{band}_{name}"] = band_stats[name]
+        output.append(row)
 
-df = pd.DataFrame(output)
-df.to_csv('water_quality_dataset.csv', index=False)
-print('Saved water_quality_dataset.csv ✅')
+    df = pd.DataFrame(output)
+    df.to_csv(args.output, index=False)
+    print(f'Saved {args.output} ✅')
@@ -1,91 +1,182 @@
 import pandas as pd
+import numpy as np
 import json
 import sys
+import sqlite3
+import argparse
+from data_store import load_dataset, get_district, dataset_fingerprint
+from cache_store import get_snapshot, put_snapshot
 
-def get_analytics():
+# The analytics payload is computed once per dataset version and stored as a snapshot tied to
+# the dataset fingerprint. When rows are only appended, the per-district running statistics
+# (count, mean, M2 for the variance, max) are updated with just the new rows.
+# Aggregates, anomaly thresholds and labels are computed column-wise over all districts at once.
+# Bump ANALYTICS_VERSION when the payload or the snapshot layout changes.
+ANALYTICS_VERSION = 2
+SNAPSHOT_NAME = "analytics"
+# Points in each district's trend sparkline
+TREND_POINTS = 5
+
+# Snapshot served by this process, so warm workers skip the database entirely
+_memo = {"fingerprint": None, "result": None}
+
+def district_stats(rows):
+    # Every per-district aggregate in one groupby pass; chl_m2 is the sum of squared deviations
+    # from the district mean, the running form of the variance
+    grouped = rows.groupby('District', observed=True)
+    stats = grouped.agg(
+        n=('Chlorophyll_ug_L', 'size'),
+        chl_mean=('Chlorophyll_ug_L', 'mean'),
+        chl_max=('Chlorophyll_ug_L', 'max'),
+        precip_mean=('Precipitation_mm', 'mean'),
+        temp_mean=('Temperature_C', 'mean')
+    )
+    deviation = rows['Chlorophyll_ug_L'] - grouped['Chlorophyll_ug_L'].transform('mean')
+    stats['chl_m2'] = (deviation ** 2).groupby(rows['District'], observed=True).sum()
+    stats.index = stats.index.astype(str)
+    return stats
+
+def merge_state(state, new):
+    # Combine running statistics with those of a batch of new rows (Chan et al. pairwise update)
+    n_a, n_b = state["n"], new["n"]
+    n = n_a + n_b
+    delta = new["chl_mean"] - state["chl_mean"]
+    return {
+        "n": n,
+        "chl_mean": state["chl_mean"] + delta * n_b / n,
+        "chl_max": max(state["chl_max"], new["chl_max"]),
+        "precip_mean": (state["precip_mean"] * n_a + new["precip_mean"] * n_b) / n,
+        "temp_mean": (state["temp_mean"] * n_a + new["temp_mean"] * n_b) / n,
+        "chl_m2": state["chl_m2"] + new["chl_m2"] + delta ** 2 * n_a * n_b / n
+    }
+
+def find_anomalies(rows):
+    # Historical Anomaly Detection (Mean + 1.5 StdDev), latest three per district.
+    # `rows` must hold every row of the districts it covers.
+    chl = rows['Chlorophyll_ug_L']
+    grouped = chl.groupby(rows['District'], observed=True)
+    threshold = (grouped.transform('mean') + 1.5 * grouped.transform('std')).fillna(999)
+    anomalies = rows[chl > threshold].groupby('District', observed=True).tail(3)
+    cause = np.select(
+        [anomalies['Temperature_C'] > 30, anomalies['Precipitation_mm'] > 50],
+        ["Heatwave", "Flash Flood"],
+        "High Runoff"
+    )
+    records = pd.DataFrame({
+        "district": anomalies['District'].astype(str),
+        "date": anomalies['Date'].dt.strftime('%Y-%m'),
+        "value": anomalies['Chlorophyll_ug_L'].round(2),
+        "cause": cause
+    }).to_dict(orient='records')
+
+    result = {str(district): [] for district in rows['District'].unique()}
+    for record in records:
+        result[record.pop("district")].append(record)
+    return result
+
+def district_trends(rows):
+    # Latest TREND_POINTS chlorophyll observations per district, oldest first (sparkline)
+    recent = rows.sort_values('Date', kind='stable').groupby('District', observed=True).tail(TREND_POINTS)
+    trends = recent['Chlorophyll_ug_L'].round(1).groupby(recent['District'], observed=True).agg(list)
+    return {str(district): trend for district, trend in trends.items()}
+
+def assemble(df, districts, anomalies, trends):
+    # Build the /api/analytics payload from per-district state
+    stats = pd.DataFrame.from_dict(districts, orient='index')
+    std_chl = np.sqrt(stats['chl_m2'] / (stats['n'] - 1)).where(stats['n'] > 1)
+
+    board = pd.DataFrame({
+        "district": stats.index,
+        "avg": stats['chl_mean'].round(2),
+        "volatility": std_chl.round(2).fillna(0),
+        "peak": stats['chl_max'].round(2),
+        "avg_precip": stats['precip_mean'].round(2),
+        "avg_temp": stats['temp_mean'].round(2),
+        # Risk Logic
+        "status": np.select([stats['chl_mean'] > 10, stats['chl_mean'] > 5], ["Critical", "Warning"], "Safe")
+    })
+    # Sort leaderboard by avg chlorophyll descending
+    board = board.sort_values('avg', ascending=False, kind='stable')
+    leaderboard = board.to_dict(orient='records')
+    for entry in leaderboard:
+        entry["anomalies"] = anomalies[entry["district"]]
+        entry["trend"] = trends[entry["district"]]
+
+    total_samples = int(stats['n'].sum())
+    avg_chlorophyll = (stats['chl_mean'] * stats['n']).sum() / total_samples
+
+    # Top 5 for the simple bar chart (Legacy support)
+    chart_labels = [d['district'] for d in leaderboard[:5]]
+    chart_data = [d['avg'] for d in leaderboard[:5]]
+
+    # Raw Data for Correlation Lab (Limit to last 500 points for performance)
+    raw_cols = ['Precipitation_mm', 'Temperature_C', 'Chlorophyll_ug_L']
+    raw_data = df[raw_cols].tail(500).to_dict(orient='records')
+
+    return {
+        "total_samples": total_samples,
+        "district_count": len(stats),
+        "avg_chlorophyll": round(avg_chlorophyll, 2),
+        "leaderboard": leaderboard,
+        "chart_data": {
+            "labels": chart_labels,
+            "values": chart_data
+        },
+        "raw_data": raw_data # New for Scatter Plot
+    }
+
+def snapshot_value(df, districts, anomalies, trends):
+    return {"version": ANALYTICS_VERSION, "n_rows": len(df), "districts": districts, "anomalies": anomalies,
+            "trends": trends, "result": assemble(df, districts, anomalies, trends)}
+
+def build_snapshot(df):
+    # Full computation over every district
+    districts = district_stats(df).to_dict(orient='index')
+    return snapshot_value(df, districts, find_anomalies(df), district_trends(df))
+
+def update_snapshot(snapshot, df):
+    # Fold rows appended since the snapshot into the running statistics; only the districts
+    # that received rows have their anomalies and trends re-scanned
+    districts, anomalies, trends = dict(snapshot["districts"]), dict(snapshot["anomalies"]), dict(snapshot["trends"])
+    new_stats = district_stats(df.iloc[snapshot["n_rows"]:]).to_dict(orient='index')
+    for district, new in new_stats.items():
+        districts[district] = merge_state(districts[district], new) if district in districts else new
+    changed = pd.concat([get_district(district) for district in new_stats])
+    anomalies.update(find_anomalies(changed))
+    trends.update(district_trends(changed))
+    return snapshot_value(df, districts, anomalies, trends)
+
+def compute_analytics(rebuild=False):
+    df = load_dataset()
+    fingerprint = dataset_fingerprint()
+    if not rebuild and _memo["fingerprint"] == fingerprint:
+        return _memo["result"]
+
+    stored = None if rebuild else get_snapshot(SNAPSHOT_NAME)
+    snapshot = stored["value"] if stored and stored["value"].get("version") == ANALYTICS_VERSION else None
+
+    if snapshot is None or stored["fingerprint"] != fingerprint:
+        appended = snapshot is not None and snapshot["n_rows"] < len(df) and \
+            dataset_fingerprint(snapshot["n_rows"]) == stored["fingerprint"]
+        snapshot = update_snapshot(snapshot, df) if appended else build_snapshot(df)
+        try:
+            put_snapshot(SNAPSHOT_NAME, fingerprint, snapshot)
+        except sqlite3.Error as e:
+            print(f"Warning: could not store analytics snapshot: {e}", file=sys.stderr)
+
+    _memo.update(fingerprint=fingerprint, result=snapshot["result"])
+    return snapshot["result"]
+
+def get_analytics(rebuild=False):
     try:
-        # Load Data
-        df = pd.read_csv('dataset/tamil_nadu_water_quality_dataset.csv')
-        
-        # 1. Total Samples
-        total_samples = len(df)
-        
-        # 2. Statistics
-        unique_districts = df['District'].nunique()
-        avg_chlorophyll = df['Chlorophyll_ug_L'].mean()
-        
-        # 3. Aggregations
-        # Group by District to get Stats
-        grouped = df.groupby('District')
-        
-        # Prepare Leaderboard & Profile Data (All Districts)
-        leaderboard = []
-        for district, group in grouped:
-            avg_chl = group['Chlorophyll_ug_L'].mean()
-            std_chl = group['Chlorophyll_ug_L'].std()
-            max_chl = group['Chlorophyll_ug_L'].max()
-            avg_precip = group['Precipitation_mm'].mean()
-            avg_temp = group['Temperature_C'].mean()
-
-            # Risk Logic
-            status = "Safe"
-            if avg_chl > 10: status = "Critical"
-            elif avg_chl > 5: status = "Warning"
-            
-            # Historical Anomaly Detection (Mean + 1.5 StdDev)
-            threshold = avg_chl + (1.5 * std_chl) if not pd.isna(std_chl) else 999
-            anomalies = group[group['Chlorophyll_ug_L'] > threshold].tail(3)
-            anomaly_list = []
-            for _, row in anomalies.iterrows():
-                anomaly_list.append({
-                    "date": str(row['Date']),
-                    "value": round(row['Chlorophyll_ug_L'], 2),
-                    "cause": "Heatwave" if row['Temperature_C'] > 30 else "Flash Flood" if row['Precipitation_mm'] > 50 else "High Runoff"
-                })
-
-            leaderboard.append({
-                "district": district,
-                "avg": round(avg_chl, 2),
-                "volatility": round(std_chl, 2) if not pd.isna(std_chl) else 0,
-                "peak": round(max_chl, 2),
-                "avg_precip": round(avg_precip, 2),
-                "avg_temp": round(avg_temp, 2),
-                "status": status,
-                "anomalies": anomaly_list,
-                # Mock trend for sparkline (random variation around mean)
-                "trend": [round(avg_chl * (1 + (i*0.1 - 0.2)), 1) for i in range(5)] 
-            })
-            
-        # Sort leaderboard by avg chlorophyll descending
-        leaderboard.sort(key=lambda x: x['avg'], reverse=True)
-            
-        # Top 5 for the simple bar chart (Legacy support)
-        # Re-create top_5 based on the sorted leaderboard list
-        chart_labels = [d['district'] for d in leaderboard[:5]]
-        chart_data = [d['avg'] for d in leaderboard[:5]]
-        
-        # 4. Raw Data for Correlation Lab (Limit to last 500 points for performance)
-        # Verify columns exist before selecting
-        raw_cols = ['Precipitation_mm', 'Temperature_C', 'Chlorophyll_ug_L']
-        raw_data = df[raw_cols].tail(500).to_dict(orient='records')
-        
-        result = {
-            "total_samples": total_samples,
-            "district_count": unique_districts,
-            "avg_chlorophyll": round(avg_chlorophyll, 2),
-            "leaderboard": leaderboard,
-            "chart_data": {
-                "labels": chart_labels,
-                "values": chart_data
-            },
-            "raw_data": raw_data # New for Scatter Plot
-        }
-        
-        print(json.dumps(result))
-        
+        print(json.dumps(compute_analytics(rebuild)))
     except Exception as e:
         print(json.dumps({"error": str(e)}))
         sys.exit(1)
 
 if __name__ == "__main__":
-    get_analytics()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="Recompute the analytics snapshot from scratch")
+    args = parser.parse_args()
+
+    get_analytics(args.rebuild)
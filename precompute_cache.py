@@ -1,5 +1,12 @@
+import os
 import time
-from ensemble_model import forecast_ensemble
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ensemble_model import (
+    load_data, forecast_periods, cache_key_for, forecast_fingerprint, member_forecast,
+    build_cache_entry, store_cache_entry, PARAMETERS, MEMBERS
+)
+from cache_store import get_entry
 
 tamil_nadu_districts = [
   "Ariyalur", "Chengalpattu", "Chennai", "Coimbatore", "Cuddalore", "Dharmapuri", "Dindigul",
@@ -10,14 +17,100 @@ tamil_nadu_districts = [
   "Vellore", "Viluppuram", "Virudhunagar"
 ]
 
-print("Starting cache precomputation for all districts...")
-t_start = time.time()
-for idx, district in enumerate(tamil_nadu_districts):
+# Precompute periods = 6 (default 2024 range) and periods = 14 (default 2025-2026 range)
+DATE_RANGES = [("2024-01", "2024-06"), ("2025-12", "2026-06")]
+
+def pending_jobs(force=False):
+    # Cache entries to build, grouped by district; entries already cached with a current
+    # fingerprint are skipped, so an interrupted run resumes where it stopped
+    jobs = {}
+    for district in tamil_nadu_districts:
+        df, error = load_data(district)
+        if error:
+            print(f"Skipping {district}: {error}")
+            continue
+        fingerprint = forecast_fingerprint(df)
+        for _, end in DATE_RANGES:
+            periods = forecast_periods(df, end)
+            key = cache_key_for(district, periods)
+            cached = None if force else get_entry(key, track=False)
+            if cached is not None and cached.get('fingerprint') == fingerprint:
+                continue
+            job = jobs.setdefault(district, {"fingerprint": fingerprint, "entries": {}, "forecasts": {}})
+            job["entries"][key] = periods
+    return jobs
+
+def fit_member(district, periods, fingerprint, param, member, refit):
+    # Runs in a pool worker: one (district, parameter, model) fit at the longest horizon needed;
+    # shorter horizons are sliced from it
+    df, _ = load_data(district)
     t0 = time.time()
-    # Precompute periods = 6 (default 2024 range)
-    forecast_ensemble(district, "2024-01", "2024-06")
-    # Precompute periods = 14 (default 2025-2026 range)
-    forecast_ensemble(district, "2025-12", "2026-06")
-    print(f"[{idx+1}/{len(tamil_nadu_districts)}] Precomputed {district} in {time.time() - t0:.2f}s")
+    forecast = member_forecast(district, df, param, member, periods, fingerprint, refit)
+    return forecast, time.time() - t0
+
+def run_tasks(tasks, workers):
+    # Yields (task, result, error) as fits complete; workers == 1 keeps everything in-process
+    if workers == 1:
+        for task in tasks:
+            try:
+                yield task, fit_member(*task), None
+            except Exception as e:
+                yield task, None, e
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fit_member, *task): task for task in tasks}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+def precompute(workers, force=False):
+    jobs = pending_jobs(force)
+    tasks = [
+        (district, max(job["entries"].values()), job["fingerprint"], param, member, force)
+        for district, job in jobs.items()
+        for param in PARAMETERS
+        for member in MEMBERS
+    ]
+    entries = sum(len(job["entries"]) for job in jobs.values())
+    print(f"Precomputing {entries} cache entries ({len(tasks)} model fits) on {workers} worker(s)...")
+
+    t_start = time.time()
+    fit_seconds = 0.0
+    failed = set()
+    for done, (task, result, error) in enumerate(run_tasks(tasks, workers), start=1):
+        district, periods, _, param, member, _ = task
+        if error is not None:
+            failed.add(district)
+            print(f"[{done}/{len(tasks)}] FAILED {district} {param} {member}: {error}")
+            continue
+        forecast, elapsed = result
+        fit_seconds += elapsed
+        print(f"[{done}/{len(tasks)}] {district} ({periods}m) {param} {member} in {elapsed:.2f}s")
+
+        # Only this process writes forecast entries, once all nine members of a district are in
+        job = jobs[district]
+        job["forecasts"][(param, member)] = forecast
+        if district not in failed and len(job["forecasts"]) == len(PARAMETERS) * len(MEMBERS):
+            df, _ = load_data(district)
+            for key, entry_periods in job["entries"].items():
+                forecasts = {name: f.head(entry_periods) for name, f in job["forecasts"].items()}
+                store_cache_entry(key, build_cache_entry(df, entry_periods, forecasts, job["fingerprint"]))
+            job["forecasts"] = {}
+
+    wall = time.time() - t_start
+    throughput = len(tasks) / wall if wall else 0.0
+    parallelism = fit_seconds / wall if wall else 0.0
+    built = sum(len(job["entries"]) for district, job in jobs.items() if district not in failed)
+    print(f"Precomputation finished in {wall:.2f}s: {built}/{entries} entries, "
+          f"{throughput:.2f} fits/s, {fit_seconds:.1f}s of fitting ({parallelism:.1f}x parallel)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Fit models on a process pool of this size (1 = in-process, 0 = all CPUs)")
+    parser.add_argument("--force", action="store_true", help="Refit models and recompute entries that are already cached")
+    args = parser.parse_args()
 
-print(f"Precomputation finished successfully in {time.time() - t_start:.2f} seconds!")
+    precompute(args.workers or os.cpu_count(), args.force)
@@ -0,0 +1,133 @@
+const { spawn } = require('child_process');
+const readline = require('readline');
+const os = require('os');
+
+// Pool of long-lived Python workers (forecast_worker.py) speaking JSON lines over stdio.
+// Each worker handles one request at a time; extra requests wait in a FIFO queue.
+// A worker that dies is restarted after an exponential backoff; a slot whose worker dies
+// MAX_RESTARTS times in a row without becoming ready (e.g. a broken environment that fails
+// on import) is given up, and once every slot is given up queued and new requests fail.
+const RESTART_BASE_MS = 500;
+const RESTART_MAX_MS = 30000;
+const MAX_RESTARTS = 5;
+
+class PythonPool {
+  constructor(pythonPath, script, size) {
+    this.pythonPath = pythonPath;
+    this.script = script;
+    this.size = size || Math.max(1, Math.min(4, os.cpus().length));
+    this.workers = [];
+    this.queue = [];
+    this.nextId = 1;
+    this.closed = false;
+    // Consecutive deaths per slot without reaching ready
+    this.failures = new Array(this.size).fill(0);
+    this.restartTimers = new Set();
+    for (let i = 0; i < this.size; i++) {
+      this.workers.push(this.spawnWorker(i));
+    }
+  }
+
+  spawnWorker(index) {
+    const proc = spawn(this.pythonPath, [this.script], { stdio: ['pipe', 'pipe', 'pipe'] });
+    const worker = { index, proc, ready: false, current: null, exited: false, gaveUp: false };
+
+    readline.createInterface({ input: proc.stdout }).on('line', (line) => {
+      let message;
+      try {
+        message = JSON.parse(line);
+      } catch (e) {
+        console.error(`Python worker ${index} sent invalid JSON:`, line);
+        return;
+      }
+      if (message.ready) {
+        worker.ready = true;
+        this.failures[index] = 0;
+        this.dispatch();
+        return;
+      }
+      const job = worker.current;
+      worker.current = null;
+      if (job && job.id === message.id) {
+        if (message.error !== undefined) job.reject(new Error(message.error));
+        else job.resolve(message.result);
+      }
+      this.dispatch();
+    });
+
+    // Writes to a worker that just died surface through 'exit' instead
+    proc.stdin.on('error', () => {});
+
+    proc.stderr.on('data', (chunk) => {
+      process.stderr.write(`[python ${index}] ${chunk}`);
+    });
+
+    // A failed spawn (e.g. missing interpreter) reports 'error', possibly without 'exit'
+    proc.on('error', (error) => this.handleExit(worker, `spawn error: ${error.message}`));
+    proc.on('exit', (code, signal) => this.handleExit(worker, `code ${code}, signal ${signal}`));
+
+    return worker;
+  }
+
+  handleExit(worker, reason) {
+    if (worker.exited) return;
+    worker.exited = true;
+    worker.ready = false;
+    if (worker.current) {
+      worker.current.reject(new Error(`Python worker exited (${reason})`));
+      worker.current = null;
+    }
+    if (this.closed) return;
+
+    const index = worker.index;
+    const failures = ++this.failures[index];
+    if (failures > MAX_RESTARTS) {
+      worker.gaveUp = true;
+      console.error(`Python worker ${index} exited (${reason}) ${MAX_RESTARTS} times in a row, not restarting`);
+      if (this.workers.every((w) => w.gaveUp)) {
+        this.failQueued(new Error('No Python workers available'));
+      }
+      return;
+    }
+    const delay = Math.min(RESTART_BASE_MS * 2 ** (failures - 1), RESTART_MAX_MS);
+    console.error(`Python worker ${index} exited (${reason}), restarting in ${delay} ms`);
+    const timer = setTimeout(() => {
+      this.restartTimers.delete(timer);
+      if (!this.closed) this.workers[index] = this.spawnWorker(index);
+    }, delay);
+    this.restartTimers.add(timer);
+  }
+
+  failQueued(error) {
+    for (const job of this.queue.splice(0)) job.reject(error);
+  }
+
+  request(command, params) {
+    return new Promise((resolve, reject) => {
+      if (this.workers.every((w) => w.gaveUp)) {
+        return reject(new Error('No Python workers available'));
+      }
+      this.queue.push({ id: this.nextId++, command, params, resolve, reject });
+      this.dispatch();
+    });
+  }
+
+  dispatch() {
+    for (const worker of this.workers) {
+      if (!this.queue.length) return;
+      if (!worker.ready || worker.current) continue;
+      const job = this.queue.shift();
+      worker.current = job;
+      worker.proc.stdin.write(JSON.stringify({ id: job.id, command: job.command, params: job.params }) + '\n');
+    }
+  }
+
+  close() {
+    this.closed = true;
+    for (const timer of this.restartTimers) clearTimeout(timer);
+    this.restartTimers.clear();
+    for (const worker of this.workers) worker.proc.kill();
+  }
+}
+
+module.exports = { PythonPool };
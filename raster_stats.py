@@ -0,0 +1,113 @@
+import os
+import re
+import json
+import argparse
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.windows import Window
+from concurrent.futures import ProcessPoolExecutor
+
+# Streaming per-band statistics for the Earth Engine GeoTIFF exports. Each raster is read in
+# row-strip windows of about CHUNK_PIXELS pixels as masked arrays (nodata and NaN masked), and
+# count/mean/M2/min/max are merged chunk by chunk, so memory stays bounded by one strip no
+# matter how large the raster is. Files are summarized in parallel and returned in natural
+# order (WaterQuality_2 before WaterQuality_10).
+
+DEFAULT_BANDS = ['chlorophyll', 'temperature', 'precipitation']
+CHUNK_PIXELS = 1 << 20
+# Earth Engine exports named WaterQuality_<i> hold month i counted from this one
+EXPORT_START_MONTH = "2022-01"
+
+def natural_key(name):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+def list_rasters(data_dir, prefix="WaterQuality_"):
+    names = [f for f in os.listdir(data_dir) if f.startswith(prefix) and f.endswith('.tif')]
+    return [os.path.join(data_dir, f) for f in sorted(names, key=natural_key)]
+
+def raster_date(path, prefix="WaterQuality_"):
+    # WaterQuality_<i>.tif -> export month i; WaterQuality_YYYYMM.tif -> YYYY-MM
+    stem = os.path.basename(path)[len(prefix):-len('.tif')]
+    if re.fullmatch(r'\d{6}', stem):
+        return f"{stem[:4]}-{stem[4:]}"
+    if stem.isdigit():
+        return (pd.Period(EXPORT_START_MONTH, freq='M') + int(stem)).strftime('%Y-%m')
+    return stem
+
+def band_names(src):
+    if all(src.descriptions):
+        return list(src.descriptions)
+    return DEFAULT_BANDS[:src.count] + [f"band_{i + 1}" for i in range(len(DEFAULT_BANDS), src.count)]
+
+def strip_windows(src, chunk_pixels=CHUNK_PIXELS):
+    # Full-width strips aligned to the file's block height, about chunk_pixels each
+    block_rows = src.block_shapes[0][0] if src.block_shapes else 1
+    rows = max(block_rows, (chunk_pixels // max(src.width, 1)) // block_rows * block_rows)
+    for row in range(0, src.height, rows):
+        yield Window(0, row, src.width, min(rows, src.height - row))
+
+def merge_chunk(acc, chunk):
+    # Fold one (bands, rows, cols) masked chunk into the running per-band statistics
+    # (Chan et al. pairwise update for the mean and M2)
+    values = chunk.reshape(chunk.shape[0], -1)
+    count = values.count(axis=1)
+    has = count > 0
+    total = values.sum(axis=1).filled(0.0)
+    mean = np.divide(total, count, out=np.zeros(len(count)), where=has)
+    m2 = ((values - mean[:, None]) ** 2).sum(axis=1).filled(0.0)
+
+    n = acc["count"] + count
+    delta = mean - acc["mean"]
+    safe_n = np.where(n > 0, n, 1)
+    acc["mean"] = np.where(has, acc["mean"] + delta * count / safe_n, acc["mean"])
+    acc["m2"] = np.where(has, acc["m2"] + m2 + delta ** 2 * acc["count"] * count / safe_n, acc["m2"])
+    acc["count"] = n
+    acc["min"] = np.where(has, np.fmin(acc["min"], values.min(axis=1).filled(np.nan)), acc["min"])
+    acc["max"] = np.where(has, np.fmax(acc["max"], values.max(axis=1).filled(np.nan)), acc["max"])
+
+def raster_stats(path, chunk_pixels=CHUNK_PIXELS):
+    # {band: {"mean", "count", "min", "max", "std"}} over valid pixels; std is the population
+    # std (as np.nanstd). Bands without valid pixels get count 0 and NaN for the rest.
+    with rasterio.open(path) as src:
+        bands = band_names(src)
+        acc = {
+            "count": np.zeros(src.count, dtype=np.int64),
+            "mean": np.zeros(src.count),
+            "m2": np.zeros(src.count),
+            "min": np.full(src.count, np.nan),
+            "max": np.full(src.count, np.nan)
+        }
+        for window in strip_windows(src, chunk_pixels):
+            chunk = src.read(window=window, masked=True).astype('float64')
+            merge_chunk(acc, np.ma.masked_invalid(chunk))
+
+    stats = {}
+    for i, band in enumerate(bands):
+        count = int(acc["count"][i])
+        stats[band] = {
+            "mean": float(acc["mean"][i]) if count else float('nan'),
+            "count": count,
+            "min": float(acc["min"][i]),
+            "max": float(acc["max"][i]),
+            "std": float(np.sqrt(acc["m2"][i] / count)) if count else float('nan')
+        }
+    return stats
+
+def summarize_rasters(paths, workers=1, chunk_pixels=CHUNK_PIXELS):
+    # [(path, stats)] in the order of `paths`; workers > 1 spreads files over a process pool
+    if workers == 1:
+        return [(path, raster_stats(path, chunk_pixels)) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(zip(paths, pool.map(raster_stats, paths, [chunk_pixels] * len(paths))))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*", help="GeoTIFF files (default: every WaterQuality_*.tif in --data-dir)")
+    parser.add_argument("--data-dir", default="./dataset/google-earth-engine")
+    parser.add_argument("--workers", type=int, default=1, help="Process pool size (0 = all CPUs)")
+    args = parser.parse_args()
+
+    paths = args.paths or list_rasters(args.data_dir)
+    for path, stats in summarize_rasters(paths, args.workers or os.cpu_count()):
+        print(json.dumps({"file": os.path.basename(path), "bands": stats}))
@@ -0,0 +1,123 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from columnar_store import GOVERNMENT_CSV, columnar_dir, read_meta, read_columnar, parse_government_csv
+
+# Station-level records of the public government dataset (one row per station and year),
+# cleaned and typed once per process and indexed by state, station code and year, with the
+# per-state / per-year aggregates computed up front. Lookups only touch the matching rows.
+#
+#   python station_store.py --state GOA --year 2024
+#   python station_store.py --group-by state_year --state KERALA
+
+STATIONS_FILE = os.environ.get("WATER_QUALITY_STATIONS", GOVERNMENT_CSV)
+# Columnar copy written by `python columnar_store.py` (rows already grouped by state)
+COLUMNAR_DIR = columnar_dir("government_water_data")
+KEY_COLUMNS = ['station_code', 'location', 'state', 'year']
+GROUPINGS = {
+    "state": ['state'],
+    "year": ['year'],
+    "state_year": ['state', 'year']
+}
+DEFAULT_LIMIT = 500
+
+# Parsed dataset shared by every caller in this process.
+#   rows       - records sorted by state, station code, year
+#   states     - lowercased state -> (start, stop) into rows
+#   stations   - station code -> positions into rows
+#   years      - year -> positions into rows
+#   aggregates - grouping name -> per-group row/station counts and measure means
+_store = {"path": None, "mtime": None, "rows": None, "states": {}, "stations": {}, "years": {}, "aggregates": {}}
+
+def _load(path):
+    meta = read_meta(COLUMNAR_DIR, path)
+    frame = read_columnar(COLUMNAR_DIR, meta) if meta is not None else parse_government_csv(path)
+    # Rows without a station code are blank lines in the source file
+    frame = frame[frame['station_code'].notna()].copy()
+    frame['station_code'] = frame['station_code'].astype('int64')
+    frame['year'] = frame['year'].astype('int64')
+    frame['state'] = frame['state'].cat.remove_unused_categories()
+    keys = frame['state'].astype(str).str.lower()
+    order = pd.DataFrame({'key': keys, 'station_code': frame['station_code'], 'year': frame['year']}) \
+        .sort_values(['key', 'station_code', 'year'], kind='stable').index
+    return frame.loc[order].reset_index(drop=True)
+
+def _positions(values):
+    # value -> sorted row positions holding it
+    return {key: positions for key, positions in pd.Series(values).groupby(values, sort=False).indices.items()}
+
+def _aggregate(rows, columns):
+    measures = [column for column in rows.columns if column not in KEY_COLUMNS]
+    grouped = rows.groupby(columns, observed=True, sort=True)
+    table = grouped[measures].mean()
+    table.insert(0, 'stations', grouped['station_code'].nunique())
+    table.insert(0, 'records', grouped.size())
+    return table.reset_index()
+
+def _refresh(path=STATIONS_FILE):
+    mtime = os.path.getmtime(path)
+    if _store["rows"] is None or _store["path"] != path or _store["mtime"] != mtime:
+        rows = _load(path)
+        states = {
+            key: (int(positions[0]), int(positions[-1]) + 1)
+            for key, positions in _positions(rows['state'].astype(str).str.lower().to_numpy()).items()
+        }
+        _store.update(
+            path=path, mtime=mtime, rows=rows, states=states,
+            stations=_positions(rows['station_code'].to_numpy()),
+            years=_positions(rows['year'].to_numpy()),
+            aggregates={name: _aggregate(rows, columns) for name, columns in GROUPINGS.items()}
+        )
+    return _store
+
+def records(frame):
+    # JSON-ready records; missing measurements become null
+    return frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+
+def list_states(path=STATIONS_FILE):
+    return [str(state) for state in _refresh(path)["rows"]['state'].cat.categories]
+
+def query_stations(state=None, station_code=None, year=None, limit=DEFAULT_LIMIT, path=STATIONS_FILE):
+    # Station records matching every given filter, sorted by state, station code and year.
+    # Each filter is an index lookup; the candidate positions are intersected.
+    if limit is not None and limit < 0:
+        return {"error": f"limit must be 0 (all) or positive, got {limit}"}
+    store = _refresh(path)
+    selected = None
+    if state is not None:
+        bounds = store["states"].get(state.strip().lower())
+        selected = np.arange(*bounds) if bounds else np.empty(0, dtype=np.int64)
+    for index, value in ((store["stations"], station_code), (store["years"], year)):
+        if value is None:
+            continue
+        positions = index.get(int(value), np.empty(0, dtype=np.int64))
+        selected = positions if selected is None else np.intersect1d(selected, positions, assume_unique=True)
+    rows = store["rows"] if selected is None else store["rows"].take(selected)
+    return {"total": len(rows), "stations": records(rows.head(limit) if limit else rows)}
+
+def station_aggregates(group_by="state", state=None, year=None, path=STATIONS_FILE):
+    # Precomputed per-group counts and measure means, optionally narrowed to one state/year
+    if group_by not in GROUPINGS:
+        return {"error": f"Unknown grouping: {group_by} (choose from {', '.join(GROUPINGS)})"}
+    table = _refresh(path)["aggregates"][group_by]
+    if state is not None and 'state' in GROUPINGS[group_by]:
+        table = table[table['state'].astype(str).str.lower() == state.strip().lower()]
+    if year is not None and 'year' in GROUPINGS[group_by]:
+        table = table[table['year'] == int(year)]
+    return {"group_by": group_by, "groups": records(table.round(3))}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--state")
+    parser.add_argument("--station", type=int, help="Station code")
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="Maximum records returned (0 = all)")
+    parser.add_argument("--group-by", choices=sorted(GROUPINGS), help="Return per-group aggregates instead of records")
+    args = parser.parse_args()
+
+    if args.group_by:
+        print(json.dumps(station_aggregates(args.group_by, args.state, args.year)))
+    else:
+        print(json.dumps(query_stations(args.state, args.station, args.year, args.limit)))
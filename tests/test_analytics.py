@@ -0,0 +1,40 @@
+import os
+import sys
+import json
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("WATER_QUALITY_DATASET", os.path.join(ROOT, "dataset", "tamil_nadu_water_quality_dataset.csv"))
+sys.path.insert(0, ROOT)
+
+from data_store import load_dataset
+from get_analytics import build_snapshot, update_snapshot
+
+class IncrementalSnapshotTest(unittest.TestCase):
+    # A snapshot of the first rows, updated with the rest, matches one built over everything
+
+    def assert_update_matches_rebuild(self, appended):
+        df = load_dataset()
+        # Snapshots are read back from their JSON form, as compute_analytics does
+        snapshot = json.loads(json.dumps(build_snapshot(df.iloc[:len(df) - appended])))
+        updated = update_snapshot(snapshot, df)
+        rebuilt = build_snapshot(df)
+
+        self.assertEqual(updated["n_rows"], rebuilt["n_rows"])
+        self.assertEqual(updated["anomalies"], rebuilt["anomalies"])
+        self.assertEqual(updated["trends"], rebuilt["trends"])
+        self.assertEqual(set(updated["districts"]), set(rebuilt["districts"]))
+        for district, stats in rebuilt["districts"].items():
+            for name, value in stats.items():
+                self.assertAlmostEqual(updated["districts"][district][name], value, places=6, msg=f"{district} {name}")
+        self.assertEqual(updated["result"], rebuilt["result"])
+
+    def test_update_with_some_districts_matches_rebuild(self):
+        # Fewer rows than districts: only part of them receive new rows
+        self.assert_update_matches_rebuild(13)
+
+    def test_update_with_every_district_matches_rebuild(self):
+        self.assert_update_matches_rebuild(100)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import sys
+import unittest
+import warnings
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("WATER_QUALITY_DATASET", os.path.join(ROOT, "dataset", "tamil_nadu_water_quality_dataset.csv"))
+sys.path.insert(0, ROOT)
+
+import ensemble_model
+from batch_forecast import batch_forecast_arima, batch_forecast_lstm
+from data_store import get_district
+
+DISTRICTS = ["Chennai", "Salem", "Nilgiris"]
+PERIODS = 8
+
+class BatchParityTest(unittest.TestCase):
+    # The batched members forecast each district exactly as the per-district ones do
+
+    def setUp(self):
+        warnings.filterwarnings("ignore")
+
+    def assert_matches(self, batch, single):
+        column = 'Chlorophyll_ug_L'
+        forecasts = batch(column, PERIODS, DISTRICTS)
+        self.assertEqual(sorted(forecasts), sorted(DISTRICTS))
+        for district, frame in forecasts.items():
+            expected = single(get_district(district), column, PERIODS)
+            np.testing.assert_array_equal(frame['ds'].values, expected['ds'].values)
+            for name in ['yhat', 'yhat_lower', 'yhat_upper']:
+                np.testing.assert_allclose(frame[name].values, expected[name].values, rtol=1e-9, err_msg=f"{district} {name}")
+
+    def test_arima_matches_forecast_arima(self):
+        self.assert_matches(batch_forecast_arima, ensemble_model.forecast_arima)
+
+    def test_lstm_matches_forecast_lstm(self):
+        self.assert_matches(batch_forecast_lstm, ensemble_model.forecast_lstm)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cache_store
+
+class SingleFlightTest(unittest.TestCase):
+    # Only callers for the same key wait for each other; every call passes its own database
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="wq_test_")
+        self.db = os.path.join(self.tmp, "cache.sqlite")
+        self.saved_seed = cache_store.LEGACY_CACHE_FILE
+        cache_store.LEGACY_CACHE_FILE = ""
+
+    def tearDown(self):
+        cache_store.LEGACY_CACHE_FILE = self.saved_seed
+        conn = cache_store._connections.pop((self.db, os.getpid()), None)
+        if conn is not None:
+            conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_same_key_waits_for_the_holder(self):
+        with cache_store.single_flight("salem_6", self.db) as waited:
+            self.assertFalse(waited)
+            with cache_store.single_flight("salem_6", self.db, timeout=0.2) as waited:
+                self.assertTrue(waited)
+
+    def test_different_keys_do_not_wait(self):
+        with cache_store.single_flight("salem_6", self.db):
+            for key in ["salem_14", "chennai_6", "madurai_6"]:
+                with cache_store.single_flight(key, self.db, timeout=0.2) as waited:
+                    self.assertFalse(waited)
+
+    def test_claims_are_released(self):
+        with cache_store.single_flight("salem_6", self.db):
+            pass
+        with cache_store.single_flight("salem_6", self.db, timeout=0.2) as waited:
+            self.assertFalse(waited)
+        inflight = cache_store._connect(self.db).execute("SELECT COUNT(*) FROM inflight").fetchone()[0]
+        self.assertEqual(inflight, 0)
+
+    def test_expired_claim_is_taken_over(self):
+        conn = cache_store._connect(self.db)
+        conn.execute("INSERT INTO inflight (key, token, claimed_at) VALUES ('salem_6', 'dead', 0)")
+        with cache_store.single_flight("salem_6", self.db, timeout=0.2) as waited:
+            self.assertFalse(waited)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+# Run against a private cache and columnar copy; the repo's own are never touched
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP = tempfile.mkdtemp(prefix="wq_test_")
+os.environ["WATER_QUALITY_DATASET"] = os.path.join(ROOT, "dataset", "tamil_nadu_water_quality_dataset.csv")
+os.environ["FORECAST_CACHE_DB"] = os.path.join(TMP, "cache.sqlite")
+os.environ["FORECAST_CACHE_SEED"] = ""
+sys.path.insert(0, ROOT)
+
+import data_store
+import cache_store
+import ensemble_model
+from columnar_store import ingest_district_dataset
+
+class ColdForecastTest(unittest.TestCase):
+    # A process that has not loaded the dataset reads only the requested district's rows
+    # from the columnar copy, for both single and batch forecasts
+
+    @classmethod
+    def setUpClass(cls):
+        cls.columnar = os.path.join(TMP, "columnar")
+        ingest_district_dataset(data_store.DATASET_FILE, cls.columnar)
+        # Also when another test module imported cache_store before the variables above were set
+        cls.saved_cache = (cache_store.CACHE_DB, cache_store.LEGACY_CACHE_FILE)
+        cache_store.CACHE_DB = os.environ["FORECAST_CACHE_DB"]
+        cache_store.LEGACY_CACHE_FILE = ""
+
+    @classmethod
+    def tearDownClass(cls):
+        cache_store.CACHE_DB, cache_store.LEGACY_CACHE_FILE = cls.saved_cache
+        shutil.rmtree(TMP, ignore_errors=True)
+
+    def setUp(self):
+        self.saved = (data_store.COLUMNAR_DIR, data_store.read_columnar, dict(data_store._store))
+        data_store.COLUMNAR_DIR = self.columnar
+        data_store._store.update(path=None, mtime=None, df=None, by_district=None, index={}, fingerprint=None)
+        self.reads = []
+        def recording_read(directory, meta, partition=None, *args, **kwargs):
+            self.reads.append(partition)
+            return self.saved[1](directory, meta, partition, *args, **kwargs)
+        data_store.read_columnar = recording_read
+
+    def tearDown(self):
+        data_store.COLUMNAR_DIR, data_store.read_columnar, store = self.saved
+        data_store._store.update(store)
+
+    def test_cold_forecast_reads_only_its_district(self):
+        output = ensemble_model.forecast_ensemble("Chennai", "2025-01-01", "2025-06-01")
+        self.assertNotIn("error", output)
+        self.assertTrue(self.reads)
+        self.assertEqual({partition.lower() for partition in self.reads}, {"chennai"})
+        self.assertIsNone(data_store._store["df"])
+
+    def test_batch_reads_only_requested_districts(self):
+        items = list(ensemble_model.forecast_batch(["Salem", "Nowhere"], "2025-01-01", "2025-06-01"))
+        self.assertEqual(items[-1]["summary"]["errors"], 1)
+        self.assertEqual({partition.lower() for partition in self.reads}, {"salem", "nowhere"})
+        self.assertIsNone(data_store._store["df"])
+
+    def test_batch_answers_repeated_districts_once(self):
+        items = list(ensemble_model.forecast_batch(["Salem", "salem", "Nowhere", "Salem", "NOWHERE"],
+                                                   "2025-01-01", "2025-06-01"))
+        lines, summary = items[:-1], items[-1]["summary"]
+        self.assertEqual(sorted(item["district"] for item in lines), ["Nowhere", "Salem"])
+        self.assertEqual(summary["districts"], 2)
+        # The error count is the number of error lines actually sent
+        self.assertEqual(summary["errors"], sum("error" in item for item in lines))
+        self.assertEqual(summary["errors"], 1)
+
+    def test_batch_reports_failures_and_finishes(self):
+        # A miss and a stale refresh that raise in-process each get their own line, the batch
+        # still ends with its summary and the refresh claim is given back
+        entry, error = ensemble_model.forecast_baselines("Salem", "2025-01-01", "2025-06-01")
+        self.assertIsNone(error)
+        key = ensemble_model.cache_key_for("Salem", len(entry["ds"]))
+        cache_store.put_entry(key, dict(entry, fingerprint="outdated"))
+        def fail(*args, **kwargs):
+            raise sqlite3.OperationalError("database is locked")
+        saved = (ensemble_model.forecast_ensemble, ensemble_model.forecast_baselines)
+        ensemble_model.forecast_ensemble = ensemble_model.forecast_baselines = fail
+        try:
+            items = list(ensemble_model.forecast_batch(["Salem", "Erode"], "2025-01-01", "2025-06-01", workers=1))
+        finally:
+            ensemble_model.forecast_ensemble, ensemble_model.forecast_baselines = saved
+        lines = sorted((item["district"], kind) for item in items[:-1] for kind in item if kind != "district")
+        self.assertEqual(lines, [("Erode", "error"), ("Salem", "refresh_error"), ("Salem", "result")])
+        self.assertEqual(items[-1]["summary"]["errors"], 1)
+        self.assertEqual(cache_store.refreshes_running(), 0)
+
+    def test_pushdown_matches_loaded_dataset(self):
+        cold = data_store.read_rows("Madurai", "2022-01", "2023-06")
+        # Same rows from the CSV-backed store
+        data_store.COLUMNAR_DIR = os.path.join(TMP, "missing")
+        data_store.load_dataset()
+        warm = data_store.read_rows("Madurai", "2022-01", "2023-06")
+        self.assertEqual(data_store.rows_fingerprint(cold), data_store.rows_fingerprint(warm))
+
+if __name__ == "__main__":
+    unittest.main()
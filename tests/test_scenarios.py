@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ensemble_model import render_forecast, sweep_matrix, risk_codes, RISK_LEVELS
+
+def cached_entry(hist_precip_avg=120.0, hist_temp_avg=28.0):
+    # A cache entry as build_cache_entry stores it, over six months
+    rng = np.random.default_rng(7)
+    chl = list(rng.uniform(2, 12, 6))
+    return {
+        "ds": [f"2025-{month:02d}-01" for month in range(1, 7)],
+        "Precip_baseline": list(rng.uniform(40, 250, 6)),
+        "Temp_baseline": list(rng.uniform(22, 34, 6)),
+        "Chl_baseline": chl,
+        "Chl_lower": [value * 0.8 for value in chl],
+        "Chl_upper": [value * 1.2 for value in chl],
+        "Chl_prophet": chl,
+        "Chl_arima": chl,
+        "Chl_lstm": chl,
+        "hist_precip_avg": hist_precip_avg,
+        "hist_temp_avg": hist_temp_avg,
+        "explainability": {"Precipitation": 0.35, "Temperature": 0.65},
+        "metrics": {},
+        "stats": {}
+    }
+
+class SweepParityTest(unittest.TestCase):
+    # Every point of a sweep matches the single scenario rendered on its own
+
+    def assert_matches_render(self, cached):
+        precip_factors = np.linspace(0.5, 1.5, 5)
+        temp_biases = np.array([-2.0, 0.0, 1.5, 4.0])
+        impact, chl = sweep_matrix(cached, precip_factors, temp_biases)
+        risk = risk_codes(chl[:, :, -1])
+        for i, precip_factor in enumerate(precip_factors):
+            for j, temp_bias in enumerate(temp_biases):
+                single = render_forecast(cached, precip_factor, temp_bias, "columnar")
+                np.testing.assert_allclose(chl[i, j], single["Chlorophyll_ug_L"]["yhat"], rtol=1e-12)
+                np.testing.assert_allclose(impact[i, j] * np.array(cached["Chl_upper"]),
+                                           single["Chlorophyll_ug_L"]["yhat_upper"], rtol=1e-12)
+                self.assertEqual(RISK_LEVELS[risk[i, j]], single["risk_status"])
+
+    def test_sweep_matches_per_scenario_render(self):
+        self.assert_matches_render(cached_entry())
+
+    def test_sweep_matches_render_without_history_averages(self):
+        self.assert_matches_render(cached_entry(hist_precip_avg=0.0, hist_temp_avg=0.0))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import json
+import cProfile
+import pstats
+from contextlib import contextmanager
+
+# Opt-in per-stage timing spans. Enable with WQ_TIMINGS=1 (inherited by the warm workers)
+# or the --timings flag of ensemble_model.py. When disabled, span() costs one global lookup.
+#   start()           - begin recording for one request
+#   with span(name):  - time one stage; nested spans are recorded with their parent's name as prefix
+#   collect()         - stop recording and return {"total_ms", "spans": [{"stage", "ms"}, ...]}
+#   merge(recorded)   - add spans collect()ed in another process (e.g. a pool worker) under the current span
+
+TIMINGS_ENABLED = os.environ.get("WQ_TIMINGS", "").lower() in ("1", "true", "yes")
+
+_recording = {"spans": None, "stack": [], "started": None}
+
+def enabled():
+    return TIMINGS_ENABLED
+
+def recording():
+    return _recording["spans"] is not None
+
+def start():
+    _recording.update(spans=[], stack=[], started=time.perf_counter())
+
+@contextmanager
+def span(name):
+    if _recording["spans"] is None:
+        yield
+        return
+    stack = _recording["stack"]
+    stack.append(name)
+    stage = "/".join(stack)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _recording["spans"].append({"stage": stage, "ms": round((time.perf_counter() - t0) * 1000, 3)})
+        stack.pop()
+
+def collect():
+    spans = _recording["spans"]
+    if spans is None:
+        return None
+    total = (time.perf_counter() - _recording["started"]) * 1000
+    _recording.update(spans=None, stack=[], started=None)
+    return {"total_ms": round(total, 3), "spans": spans}
+
+def merge(recorded):
+    if _recording["spans"] is None or not recorded:
+        return
+    prefix = "/".join(_recording["stack"])
+    for entry in recorded["spans"]:
+        stage = f"{prefix}/{entry['stage']}" if prefix else entry["stage"]
+        _recording["spans"].append({"stage": stage, "ms": entry["ms"]})
+
+def log(event, timings, stream=sys.stderr):
+    # One structured JSON line per request, e.g. for grepping slow stages out of server logs
+    stream.write(json.dumps({"event": event, **timings}) + "\n")
+    stream.flush()
+
+def profile_call(path, fn, *args, **kwargs):
+    # Runs fn under cProfile, dumps the stats to `path` (open with snakeviz or pstats)
+    # and prints the top cumulative entries to stderr
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn, *args, **kwargs)
+    profiler.dump_stats(path)
+    pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
+    return result
@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.features import rasterize
+from rasterio.warp import transform_geom
+from concurrent.futures import ProcessPoolExecutor
+from raster_stats import list_rasters, raster_date, band_names, strip_windows, CHUNK_PIXELS
+
+# Per-district zonal statistics for the Earth Engine GeoTIFFs. District boundaries are
+# rasterized once per raster grid into a label raster (0 = outside every district, i = the
+# i-th district) that is cached on disk; every band of every raster is then reduced per
+# district with np.bincount over the labels. Rows come out in the district dataset format
+# read by data_store / ensemble_model.load_data.
+#
+#   python zonal_stats.py --boundaries districts.geojson --output new_rows.csv
+#   python zonal_stats.py --boundaries districts.geojson --append     # complete rows only
+
+LABEL_CACHE_DIR = "./dataset/district_labels"
+# Property holding the district name, tried in this order unless --name-field is given
+NAME_FIELDS = ['District', 'district', 'DISTRICT', 'dtname', 'ADM2_NAME', 'NAME_2', 'name']
+# Raster band -> district dataset column
+BAND_COLUMNS = {
+    'chlorophyll': 'Chlorophyll_ug_L',
+    'temperature': 'Temperature_C',
+    'precipitation': 'Precipitation_mm'
+}
+DATASET_COLUMNS = ['Date', 'District', 'Precipitation_mm', 'Temperature_C', 'Chlorophyll_ug_L']
+
+def load_boundaries(path, name_field=None):
+    # [(district, geometry)] from a GeoJSON FeatureCollection (EPSG:4326, as GeoJSON mandates)
+    with open(path) as f:
+        features = json.load(f)["features"]
+    if not features:
+        raise ValueError(f"No features in {path}")
+    properties = features[0].get("properties") or {}
+    field = name_field or next((name for name in NAME_FIELDS if name in properties), None)
+    if field is None:
+        raise ValueError(f"No district name property in {path}; pass --name-field (properties: {', '.join(properties)})")
+    return [(str(feature["properties"][field]), feature["geometry"]) for feature in features]
+
+def label_cache_path(boundaries_path, name_field, src, cache_dir=LABEL_CACHE_DIR):
+    # One cached label raster per (boundaries content, name field, raster grid)
+    digest = hashlib.sha1()
+    with open(boundaries_path, 'rb') as f:
+        digest.update(f.read())
+    digest.update(json.dumps([name_field, str(src.crs), src.transform.to_gdal(), src.width, src.height]).encode())
+    return os.path.join(cache_dir, f"{digest.hexdigest()[:16]}.npz")
+
+def district_labels(boundaries_path, src, name_field=None, cache_dir=LABEL_CACHE_DIR):
+    # (labels, names): labels[row, col] is 0 outside all districts, otherwise index into names + 1
+    path = label_cache_path(boundaries_path, name_field, src, cache_dir)
+    if os.path.exists(path):
+        cached = np.load(path)
+        return cached["labels"], [str(name) for name in cached["names"]]
+
+    districts = load_boundaries(boundaries_path, name_field)
+    # Features of the same district (multi-part boundaries) share one label
+    names = sorted({name for name, _ in districts})
+    label_of = {name: i + 1 for i, name in enumerate(names)}
+    shapes = []
+    for name, geometry in districts:
+        if src.crs and src.crs.to_string() != 'EPSG:4326':
+            geometry = transform_geom('EPSG:4326', src.crs, geometry)
+        shapes.append((geometry, label_of[name]))
+    dtype = 'int16' if len(names) < np.iinfo(np.int16).max else 'int32'
+    labels = rasterize(shapes, out_shape=(src.height, src.width), transform=src.transform, fill=0, dtype=dtype)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, labels=labels, names=np.array(names))
+    os.replace(tmp, path)
+    return labels, names
+
+def zonal_stats(path, boundaries_path, name_field=None, chunk_pixels=CHUNK_PIXELS):
+    # {band: {"mean", "count", "std"}} with one array entry per district (same order as the
+    # returned names); districts without valid pixels get NaN
+    with rasterio.open(path) as src:
+        labels, names = district_labels(boundaries_path, src, name_field)
+        bands = band_names(src)
+        zones = len(names) + 1
+        count = np.zeros((src.count, zones))
+        total = np.zeros((src.count, zones))
+        squares = np.zeros((src.count, zones))
+        for window in strip_windows(src, chunk_pixels):
+            chunk = np.ma.masked_invalid(src.read(window=window, masked=True).astype('float64'))
+            rows = slice(window.row_off, window.row_off + window.height)
+            zone = labels[rows].ravel()
+            for b in range(src.count):
+                valid = ~np.ma.getmaskarray(chunk[b]).ravel() & (zone > 0)
+                values = chunk[b].data.ravel()[valid]
+                z = zone[valid]
+                count[b] += np.bincount(z, minlength=zones)
+                total[b] += np.bincount(z, weights=values, minlength=zones)
+                squares[b] += np.bincount(z, weights=values * values, minlength=zones)
+
+    stats = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        std = np.sqrt(np.maximum(squares / count - mean * mean, 0.0))
+    for b, band in enumerate(bands):
+        # Zone 0 (outside every district) is dropped
+        stats[band] = {"mean": mean[b, 1:], "count": count[b, 1:].astype(np.int64), "std": std[b, 1:]}
+    return names, stats
+
+def district_rows(path, boundaries_path, name_field=None):
+    # One dataset row per district for the raster's month
+    names, stats = zonal_stats(path, boundaries_path, name_field)
+    date = raster_date(path)
+    frame = pd.DataFrame({'Date': date, 'District': names})
+    for band, column in BAND_COLUMNS.items():
+        frame[column] = stats[band]["mean"] if band in stats else np.nan
+    if 'precipitation' in stats:
+        # CHIRPS composites are mean mm/day; the dataset holds monthly totals
+        frame['Precipitation_mm'] *= pd.Period(date, freq='M').days_in_month
+    return frame[DATASET_COLUMNS].round(2)
+
+def zonal_dataset(paths, boundaries_path, name_field=None, workers=1):
+    if paths and workers != 1:
+        # Build the label raster once up front so pool workers only read the cache
+        with rasterio.open(paths[0]) as src:
+            district_labels(boundaries_path, src, name_field)
+    if workers == 1:
+        frames = [district_rows(path, boundaries_path, name_field) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(district_rows, paths, [boundaries_path] * len(paths), [name_field] * len(paths)))
+    if not frames:
+        return pd.DataFrame(columns=DATASET_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*", help="GeoTIFF files (default: every WaterQuality_*.tif in --data-dir)")
+    parser.add_argument("--boundaries", required=True, help="District boundaries as GeoJSON (EPSG:4326)")
+    parser.add_argument("--name-field", help="Feature property with the district name")
+    parser.add_argument("--data-dir", default="./dataset/google-earth-engine")
+    parser.add_argument("--workers", type=int, default=1, help="Process pool size (0 = all CPUs)")
+    parser.add_argument("--output", default="district_water_quality.csv", help="CSV in the district dataset format")
+    parser.add_argument("--append", action="store_true",
+                        help="Append the complete rows to the district dataset (see append_data.py) instead of writing --output")
+    args = parser.parse_args()
+
+    paths = args.paths or list_rasters(args.data_dir)
+    rows = zonal_dataset(paths, args.boundaries, args.name_field, args.workers or os.cpu_count())
+    if args.append:
+        from append_data import append_rows
+        complete = rows.dropna()
+        if len(complete) < len(rows):
+            print(f"Skipping {len(rows) - len(complete)} row(s) with missing bands or no pixels", file=sys.stderr)
+        complete.to_csv(args.output, index=False)
+        append_rows(args.output)
+        print(f"Appended {len(complete)} rows to the district dataset (run append_data.py --districts ... to refresh forecasts)")
+    else:
+        rows.to_csv(args.output, index=False)
+        print(f"Saved {len(rows)} rows for {rows['District'].nunique()} districts to {args.output}")